@@ -0,0 +1,82 @@
+# encyclopedia_transfer.py
+"""
+Copy the concept/drill library between environments.
+
+    python -m app.encyclopedia_transfer export library.ndjson
+    python -m app.encyclopedia_transfer import library.ndjson
+"""
+import argparse
+import sys
+
+from app.db import Base, SessionLocal, engine
+from app.services import encyclopedia_io, media_store, response_cache, search_index
+
+# Import models so SQLAlchemy knows about them
+import app.models.tag
+import app.models.drill
+import app.models.concept
+import app.models.concept_relation
+import app.models.concept_version
+import app.models.concept_link
+import app.models.concept_tag
+import app.models.content_version
+import app.models.media_blob
+import app.models.player
+import app.models.player_history
+import app.models.session
+
+
+def run_export(path: str):
+    db = SessionLocal()
+    try:
+        out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+        try:
+            for chunk in encyclopedia_io.export_lines(db):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    finally:
+        db.close()
+    if path != "-":
+        print(f"🎉 Export written to {path}")
+
+
+def run_import(path: str, batch_size: int):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        search_index.ensure_search_index(conn)
+
+    def report(counts):
+        print("   " + ", ".join(f"{k}: {v}" for k, v in counts.items() if v))
+
+    db = SessionLocal()
+    try:
+        print(f"Importing {path}...")
+        with open(path, "r", encoding="utf-8") as f:
+            counts = encyclopedia_io.import_lines(db, f, batch_size=batch_size, progress=report)
+
+        print("Rebuilding search index...")
+        search_index.rebuild(db)
+        media_store.rebuild_refs(db)
+        response_cache.bump(db)
+        db.commit()
+        print(f"\n🎉 Import complete! {sum(counts.values())} records.")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="NDJSON file ('-' for stdout on export)")
+    parser.add_argument("--batch-size", type=int, default=encyclopedia_io.IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        run_export(args.path)
+    else:
+        run_import(args.path, args.batch_size)
@@ -1,9 +1,11 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from app.db import Base, engine
-from app.routers import concepts, players, drills, player_drills, player_history, sessions
+from app.db import Base, engine, SessionLocal
+from app.routers import concepts, players, drills, player_drills, player_history, sessions, leaderboards, media
+from app.services import media_derivatives, media_store, search_index, uploads
 
 # Import models so SQLAlchemy knows about them
 import app.models.tag
@@ -13,12 +15,27 @@ import app.models.concept_relation
 import app.models.concept_version
 import app.models.concept_link
 import app.models.concept_tag
+import app.models.content_version
+import app.models.player_summary
+import app.models.metric_definition
+import app.models.metric_rollup
+import app.models.media_blob
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Reclaim media blobs nothing references any more
+    stop_gc = media_store.start_gc(SessionLocal)
+    yield
+    stop_gc.set()
+    media_derivatives.shutdown()
+
 
 # Create FastAPI app
-app = FastAPI(title="Player Development API")
+app = FastAPI(title="Player Development API", lifespan=lifespan)
 
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Refuse oversized uploads before Starlette spools them to disk
+app.add_middleware(uploads.UploadLimitMiddleware)
 
 # CORS
 origins = ["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:5174",]
@@ -28,6 +45,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Accept-Ranges", "Content-Range", "Content-Length"],
 )
 
 # Include routers
@@ -37,10 +55,20 @@ app.include_router(player_drills.router)
 app.include_router(player_history.router)
 app.include_router(concepts.router)
 app.include_router(sessions.router)
+app.include_router(leaderboards.router)
+app.include_router(media.router)  # /media, /uploads, /uploaded_videos
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+# Full-text search index (back-filled the first time it is created)
+with engine.begin() as conn:
+    search_index_created = search_index.ensure_search_index(conn)
+if search_index_created:
+    with SessionLocal() as db:
+        search_index.rebuild(db)
+        db.commit()
+
 @app.get("/")
 def root():
     return {"message": "Hello, FastAPI!"}
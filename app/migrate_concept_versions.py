@@ -0,0 +1,79 @@
+# migrate_concept_versions.py
+from sqlalchemy import text
+from app.db import engine, SessionLocal
+from app.services import concept_versions
+
+# Import models so the relationship mappers are configured
+import app.models.tag
+import app.models.drill
+import app.models.concept
+import app.models.concept_relation
+import app.models.concept_version
+import app.models.concept_link
+import app.models.concept_tag
+import app.models.player
+import app.models.player_history
+import app.models.session
+
+NEW_COLUMNS = [
+    ("version_no", "INTEGER"),
+    ("kind", "TEXT DEFAULT 'snapshot'"),
+    ("base_version", "INTEGER"),
+    ("body_hash", "TEXT"),
+    ("body_length", "INTEGER"),
+]
+
+
+def run_migration():
+    print("Connecting to database...")
+    try:
+        with engine.connect() as conn:
+            for name, ddl in NEW_COLUMNS:
+                print(f"Adding '{name}' column to concept_versions table...")
+                try:
+                    conn.execute(text(f"ALTER TABLE concept_versions ADD COLUMN {name} {ddl}"))
+                    print(f"✅ {name} column added.")
+                except Exception as e:
+                    if "duplicate column name" in str(e).lower():
+                        print(f"ℹ️ {name} column already exists.")
+                    else:
+                        raise e
+            conn.commit()
+
+        db = SessionLocal()
+        try:
+            print("Re-encoding stored revisions as snapshots + deltas...")
+            concept_ids = [
+                row[0] for row in db.execute(text("SELECT DISTINCT concept_id FROM concept_versions"))
+            ]
+            rewritten = sum(concept_versions.compact(db, cid) for cid in concept_ids)
+            db.commit()
+            print(f"✅ {rewritten} revisions re-encoded.")
+
+            print("Recording a first revision for concepts without history...")
+            missing = db.execute(text("""
+                SELECT id, body FROM concepts
+                WHERE id NOT IN (SELECT concept_id FROM concept_versions)
+            """)).all()
+            for concept_id, body in missing:
+                concept_versions.record_version(db, concept_id, body or "", change_summary="Initial revision")
+            db.commit()
+            print(f"✅ {len(missing)} concepts seeded.")
+        finally:
+            db.close()
+
+        with engine.connect() as conn:
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_concept_versions_concept_version "
+                "ON concept_versions (concept_id, version_no)"
+            ))
+            conn.commit()
+
+        print("\n🎉 Migration complete! Concept revisions are now delta-compressed.")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,135 @@
+# migrate_media_store.py
+"""
+Move legacy uploads (uploads/, uploaded_videos/) into the content-addressed
+media store, rewrite the URLs that point at them and rebuild media refs.
+
+    python -m app.migrate_media_store
+
+Originals are only deleted once a row has been pointed at their copy. Files
+no row references stay where they are and are listed at the end (their
+unreferenced copies are left to the media GC). Safe to re-run.
+"""
+import json
+import os
+
+from app.db import Base, SessionLocal, engine
+from app.models.concept import Concept
+from app.models.drill import Drill
+from app.models.session import SessionMedia
+from app.services import media_store, response_cache
+
+# Import models so SQLAlchemy knows about them
+import app.models.tag
+import app.models.concept_relation
+import app.models.concept_version
+import app.models.concept_link
+import app.models.concept_tag
+import app.models.content_version
+import app.models.media_blob
+import app.models.player
+import app.models.player_history
+import app.models.player_summary
+import app.models.metric_definition
+import app.models.metric_rollup
+
+LEGACY_DIRS = ("uploads", "uploaded_videos")
+
+
+def _legacy_name(url: str, bare_dir: str):
+    """(directory, file name) of a legacy upload URL or path, or None."""
+    if not url or media_store.blob_key(url):
+        return None
+    # Drills created on Windows stored os.path.join() paths: uploaded_videos\<name>
+    url = url.replace("\\", "/")
+    for directory in LEGACY_DIRS:
+        marker = f"{directory}/"
+        if url.startswith(marker) or f"/{marker}" in url:
+            return directory, os.path.basename(url)
+    # Concepts store bare file names for files under uploads/
+    if bare_dir and "/" not in url and not url.startswith("http"):
+        return bare_dir, url
+    return None
+
+
+def _rewrite(urls, moved, used, bare_dir=None):
+    """Point legacy URLs at their stored copies, adding each rewritten file to `used`."""
+    changed = False
+    result = []
+    for url in urls:
+        legacy = _legacy_name(url, bare_dir)
+        if legacy in moved:
+            url = moved[legacy]
+            used.add(legacy)
+            changed = True
+        result.append(url)
+    return result, changed
+
+
+def run_migration():
+    print("Connecting to database...")
+    try:
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            # 1. Copy every legacy file into the store
+            moved = {}
+            for directory in LEGACY_DIRS:
+                if not os.path.isdir(directory):
+                    continue
+                names = [n for n in os.listdir(directory) if os.path.isfile(os.path.join(directory, n))]
+                print(f"Storing {len(names)} files from {directory}/...")
+                for name in names:
+                    path = os.path.join(directory, name)
+                    with open(path, "rb") as f:
+                        blob = media_store.put(db, f, name)
+                    db.commit()
+                    moved[(directory, name)] = blob.url
+            print(f"✅ {len(moved)} files stored.")
+
+            # 2. Point the rows at the store
+            print("Rewriting media URLs...")
+            rewritten = 0
+            used = set()
+            for concept in db.query(Concept):
+                urls, changed = _rewrite(media_store.concept_urls(concept), moved, used, bare_dir="uploads")
+                if changed:
+                    concept.media_files = json.dumps(urls)
+                    rewritten += 1
+            for drill in db.query(Drill):
+                urls, changed = _rewrite(media_store.url_list(drill.media_files), moved, used)
+                (video_url,), video_changed = _rewrite([drill.video_url], moved, used)
+                if changed or video_changed:
+                    drill.media_files = json.dumps(urls)
+                    drill.video_url = video_url
+                    rewritten += 1
+            for media in db.query(SessionMedia):
+                (file_url,), changed = _rewrite([media.file_url], moved, used)
+                if changed:
+                    media.file_url = file_url
+                    rewritten += 1
+            print(f"✅ {rewritten} rows updated.")
+
+            print("Rebuilding media refs...")
+            refs = media_store.rebuild_refs(db)
+            response_cache.bump(db)
+            db.commit()
+
+            # 3. Only now that rows point at the copies, remove those originals
+            for directory, name in used:
+                os.unlink(os.path.join(directory, name))
+            unmatched = sorted(set(moved) - used)
+        finally:
+            db.close()
+
+        if unmatched:
+            print(f"⚠️  {len(unmatched)} files are not referenced by any row and were left in place:")
+            for directory, name in unmatched:
+                print(f"   {os.path.join(directory, name)}")
+        print(f"\n🎉 Migration complete! {refs} media refs.")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
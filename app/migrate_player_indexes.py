@@ -0,0 +1,39 @@
+# migrate_player_indexes.py
+from sqlalchemy import text
+from app.db import engine
+
+INDEXES = {
+    "ix_players_name_sort": "players (last_name COLLATE NOCASE, first_name COLLATE NOCASE, id)",
+    "ix_players_first_name_sort": "players (first_name COLLATE NOCASE, last_name COLLATE NOCASE, id)",
+    "ix_players_team_sort": "players (coalesce(team, ''), last_name COLLATE NOCASE, first_name COLLATE NOCASE, id)",
+    "ix_players_position_sort": "players (coalesce(position, ''), last_name COLLATE NOCASE, first_name COLLATE NOCASE, id)",
+    "ix_players_dob_sort": "players (coalesce(dob, ''), last_name COLLATE NOCASE, first_name COLLATE NOCASE, id)",
+    "ix_players_team": "players (team)",
+    "ix_players_position": "players (position)",
+}
+# Superseded by the *_sort indexes above
+OLD_INDEXES = ["ix_players_name", "ix_players_first_name"]
+
+
+def run_migration():
+    print("Connecting to database...")
+    try:
+        with engine.connect() as conn:
+            for name in OLD_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+            for name, target in INDEXES.items():
+                print(f"Creating index '{name}'...")
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+                print(f"✅ {name} ready.")
+
+            conn.execute(text("ANALYZE players"))
+            conn.commit()
+            print("\n🎉 Migration complete! Roster search is now indexed.")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
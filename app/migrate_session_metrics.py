@@ -0,0 +1,130 @@
+# migrate_session_metrics.py
+"""
+Moves session_metrics to the normalized layout: metric names/units/sources go
+to the metric_definitions dictionary and values to a REAL column (non-numeric
+values are kept in value_text). Safe to run more than once.
+"""
+from sqlalchemy import text, insert
+from app.db import Base, SessionLocal, engine
+from app.models.metric_definition import MetricDefinition
+from app.models.session import SessionMetric
+from app.services import metric_dictionary
+
+# Import models so SQLAlchemy knows about them
+import app.models.tag
+import app.models.drill
+import app.models.concept
+import app.models.concept_relation
+import app.models.concept_version
+import app.models.concept_link
+import app.models.concept_tag
+import app.models.player
+import app.models.player_history
+import app.models.player_summary
+
+NEW_TABLES = [MetricDefinition.__table__, SessionMetric.__table__]
+
+BATCH_SIZE = 5000
+
+INDEXES = {
+    "ix_session_metrics_session_metric": "session_metrics (session_id, metric_id)",
+    "ix_session_metrics_metric_value": "session_metrics (metric_id, value)",
+    "ix_sessions_player_date": "sessions (player_id, date)",
+}
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))]
+
+
+def _copy_rows(db, has_pitch_no):
+    pitch_no = "pitch_no" if has_pitch_no else "NULL"
+    result = db.execute(text(
+        f"SELECT id, session_id, source, pitch_type, {pitch_no}, metric_name, metric_value, unit "
+        "FROM session_metrics_old ORDER BY id"
+    ))
+    copied = 0
+    while True:
+        chunk = result.fetchmany(BATCH_SIZE)
+        if not chunk:
+            break
+        ids = metric_dictionary.resolve(db, (
+            metric_dictionary.make_key(source, name, unit)
+            for _, _, source, _, _, name, _, unit in chunk
+        ))
+        rows = []
+        for row_id, session_id, source, pitch_type, pitch, name, raw, unit in chunk:
+            value, value_text = metric_dictionary.split_value(raw)
+            rows.append({
+                "id": row_id,
+                "session_id": session_id,
+                "metric_id": ids[metric_dictionary.make_key(source, name, unit)],
+                "pitch_type": pitch_type,
+                "pitch_no": pitch,
+                "value": value,
+                "value_text": value_text,
+            })
+        db.execute(insert(SessionMetric.__table__), rows)
+        copied += len(rows)
+        print(f"  ...{copied} rows")
+    return copied
+
+
+def _create_indexes(db):
+    for name, target in INDEXES.items():
+        db.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+    db.execute(text("DROP INDEX IF EXISTS ix_session_metrics_session_id"))
+    print("✅ Indexes ready.")
+
+
+def run_migration():
+    print("Connecting to database...")
+    try:
+        with engine.connect() as conn:
+            columns = _columns(conn, "session_metrics")
+            old_columns = _columns(conn, "session_metrics_old")
+
+        db = SessionLocal()
+        try:
+            if old_columns:
+                # An earlier run stopped half way; the original rows are still intact
+                print("Resuming from 'session_metrics_old'...")
+                db.execute(text("DROP TABLE IF EXISTS session_metrics"))
+            elif "metric_name" in columns:
+                print("Renaming old 'session_metrics' table...")
+                db.execute(text("ALTER TABLE session_metrics RENAME TO session_metrics_old"))
+                old_columns = columns
+            else:
+                Base.metadata.create_all(bind=engine, tables=NEW_TABLES)
+                print("ℹ️ session_metrics already uses the metric dictionary.")
+                _create_indexes(db)
+                db.commit()
+                return
+            db.execute(text("DROP INDEX IF EXISTS ix_session_metrics_id"))
+            db.execute(text("DROP INDEX IF EXISTS ix_session_metrics_session_id"))
+            db.execute(text("DROP INDEX IF EXISTS ix_session_metrics_session_metric"))
+            db.execute(text("DROP INDEX IF EXISTS ix_session_metrics_metric_value"))
+
+            print("Creating 'metric_definitions' and new 'session_metrics'...")
+            Base.metadata.create_all(bind=db.connection(), tables=NEW_TABLES)
+
+            print("Copying metrics...")
+            copied = _copy_rows(db, "pitch_no" in old_columns)
+
+            db.execute(text("DROP TABLE session_metrics_old"))
+            _create_indexes(db)
+            db.commit()
+            print(f"✅ {copied} metrics converted.")
+        finally:
+            db.close()
+
+        with engine.connect() as conn:
+            conn.execute(text("VACUUM"))
+        print("\n🎉 Migration complete! Session metrics are now numeric.")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
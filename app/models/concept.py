@@ -25,17 +25,19 @@ class Concept(Base):
 
     # Relationships
     tags = relationship("Tag", secondary="concept_tags", back_populates="concepts")
-    versions = relationship("ConceptVersion", back_populates="concept")
+    versions = relationship("ConceptVersion", back_populates="concept", cascade="all, delete-orphan")
     links = relationship("ConceptLink", back_populates="concept")
     relations_from = relationship(
         "ConceptRelation",
         foreign_keys="ConceptRelation.from_concept_id",
         back_populates="from_concept",
+        cascade="all, delete-orphan",
     )
     relations_to = relationship(
         "ConceptRelation",
         foreign_keys="ConceptRelation.to_concept_id",
         back_populates="to_concept",
+        cascade="all, delete-orphan",
     )
 
     # Helper property to work with Python lists
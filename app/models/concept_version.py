@@ -1,18 +1,29 @@
 # app/models/concept_version.py
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 from app.db import Base
 
 class ConceptVersion(Base):
     __tablename__ = "concept_versions"
+    __table_args__ = (
+        Index("ix_concept_versions_concept_version", "concept_id", "version_no", unique=True),
+    )
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     concept_id = Column(String, ForeignKey("concepts.id"), nullable=False)
+    # Full text for 'snapshot' rows, a JSON line delta against the previous version for 'delta' rows
     body = Column(Text, nullable=False)
     updated_by = Column(String)  # FK to user if you want
     updated_at = Column(DateTime, default=datetime.utcnow)
     change_summary = Column(Text)
 
+    # Revision bookkeeping (see app/services/concept_versions.py)
+    version_no = Column(Integer)
+    kind = Column(String, default="snapshot")   # 'snapshot' or 'delta'
+    base_version = Column(Integer)              # version_no of the snapshot this chain starts from
+    body_hash = Column(String)                  # sha1 of the reconstructed full text
+    body_length = Column(Integer)
+
     concept = relationship("Concept", back_populates="versions")
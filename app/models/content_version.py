@@ -0,0 +1,9 @@
+# app/models/content_version.py
+from sqlalchemy import Column, String, Integer
+from app.db import Base
+
+class ContentVersion(Base):
+    __tablename__ = "content_versions"
+
+    name = Column(String, primary_key=True)      # e.g. 'encyclopedia'
+    version = Column(Integer, nullable=False, default=0)
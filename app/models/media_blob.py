@@ -0,0 +1,43 @@
+# app/models/media_blob.py
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
+from app.db import Base
+
+
+class MediaBlob(Base):
+    """
+    One stored file in the content-addressed media store, keyed by the
+    SHA-256 of its bytes (see app/services/media_store.py).
+    """
+    __tablename__ = "media_blobs"
+
+    sha256 = Column(String, primary_key=True)
+    ext = Column(String, nullable=False, default="")        # ".mp4", kept from the first upload
+    size = Column(Integer, nullable=False)
+    content_type = Column(String, nullable=True)
+    uploaded_at = Column(DateTime, default=datetime.utcnow)  # last upload of these bytes, for the GC grace period
+
+
+class MediaRef(Base):
+    """A row (concept, drill or session) whose media points at a blob."""
+    __tablename__ = "media_refs"
+
+    sha256 = Column(String, ForeignKey("media_blobs.sha256"), primary_key=True)
+    owner_type = Column(String, primary_key=True)   # concept, drill, session
+    owner_id = Column(String, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_media_refs_owner", "owner_type", "owner_id"),
+    )
+
+
+class MediaDerivative(Base):
+    """A resized image or video poster rendered from a blob (see app/services/media_derivatives.py)."""
+    __tablename__ = "media_derivatives"
+
+    sha256 = Column(String, ForeignKey("media_blobs.sha256"), primary_key=True)
+    variant = Column(String, primary_key=True)      # thumb, medium, poster
+    name = Column(String, nullable=False)           # file name under the derived directory
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    size = Column(Integer, nullable=False)
@@ -0,0 +1,20 @@
+# app/models/metric_definition.py
+from sqlalchemy import Column, Integer, String, UniqueConstraint
+from app.db import Base
+
+
+class MetricDefinition(Base):
+    """
+    Dictionary of metric names per source, referenced by SessionMetric.metric_id.
+    Maintained by app/services/metric_dictionary.py.
+    """
+    __tablename__ = "metric_definitions"
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String, nullable=False)        # rapsodo, trackman, etc
+    name = Column(String, nullable=False)          # Velocity, Total Spin, etc
+    unit = Column(String, nullable=False, default="")  # "" when the metric has no unit
+
+    __table_args__ = (
+        UniqueConstraint("source", "name", "unit", name="uq_metric_definitions"),
+    )
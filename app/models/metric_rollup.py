@@ -0,0 +1,29 @@
+# app/models/metric_rollup.py
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Index
+from app.db import Base
+
+
+class MetricRollup(Base):
+    """
+    Running aggregates per (player, metric, pitch type, period), maintained by
+    app/services/metric_rollups.py (rebuild: app/rebuild_metric_rollups.py).
+
+    period is "all", a season ("2024"), a month ("2024-03") or a day ("2024-03-05").
+    """
+    __tablename__ = "metric_rollups"
+
+    player_id = Column(String, ForeignKey("players.id"), primary_key=True)
+    metric_id = Column(Integer, ForeignKey("metric_definitions.id"), primary_key=True)  # source + metric
+    pitch_type = Column(String, primary_key=True, default="")  # "" when the metric has no pitch type
+    period = Column(String, primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+    sum = Column(Float, nullable=False, default=0.0)
+    sum_sq = Column(Float, nullable=False, default=0.0)
+    min = Column(Float, nullable=True)
+    max = Column(Float, nullable=True)
+
+    # Leaderboards read every player's cell for one metric/period
+    __table_args__ = (
+        Index("ix_metric_rollups_metric_period", "metric_id", "period", "pitch_type"),
+    )
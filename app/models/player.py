@@ -1,5 +1,5 @@
 # app/models/player.py
-from sqlalchemy import Column, String, Integer, Enum, Text, DateTime  # added DateTime
+from sqlalchemy import Column, String, Integer, Enum, Text, DateTime, Index, func, literal_column  # added DateTime
 from sqlalchemy.orm import relationship
 from app.db import Base
 import uuid
@@ -25,7 +25,24 @@ class Player(Base):
     # NEW FIELD: Tracks when the scouting notes were last changed
     notes_updated_at = Column(DateTime, nullable=True)
 
+    # Roster search indexes (app/migrate_player_indexes.py adds them to existing databases).
+    # The *_sort indexes match the roster sort keys in app/routers/players.py exactly,
+    # tie-breakers included, so they serve both the ORDER BY and the keyset seek.
+    __table_args__ = (
+        Index("ix_players_name_sort", last_name.collate("NOCASE"), first_name.collate("NOCASE"), id),
+        Index("ix_players_first_name_sort", first_name.collate("NOCASE"), last_name.collate("NOCASE"), id),
+        Index("ix_players_team_sort", func.coalesce(team, literal_column("''")),
+              last_name.collate("NOCASE"), first_name.collate("NOCASE"), id),
+        Index("ix_players_position_sort", func.coalesce(position, literal_column("''")),
+              last_name.collate("NOCASE"), first_name.collate("NOCASE"), id),
+        Index("ix_players_dob_sort", func.coalesce(dob, literal_column("''")),
+              last_name.collate("NOCASE"), first_name.collate("NOCASE"), id),
+        Index("ix_players_team", team),
+        Index("ix_players_position", position),
+    )
+
     player_drills = relationship("PlayerDrill", back_populates="player")
+    summary = relationship("PlayerSummary", uselist=False, cascade="all, delete-orphan")
     history = relationship(
         "PlayerHistory",
         back_populates="player",
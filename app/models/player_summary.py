@@ -0,0 +1,28 @@
+# app/models/player_summary.py
+import json
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey
+from app.db import Base
+
+
+class PlayerSummary(Base):
+    """
+    One row of precomputed aggregates per player, maintained by
+    app/services/player_summary.py (rebuild: app/rebuild_player_summary.py).
+    """
+    __tablename__ = "player_summary"
+
+    player_id = Column(String, ForeignKey("players.id"), primary_key=True)
+    drill_count = Column(Integer, nullable=False, default=0)
+    session_count = Column(Integer, nullable=False, default=0)
+    last_session_date = Column(DateTime, nullable=True)
+    session_type_counts_json = Column(Text, nullable=False, default="{}")  # {"Bullpen": 12, ...}
+    notes_updated_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def session_type_counts(self):
+        try:
+            return json.loads(self.session_type_counts_json) if self.session_type_counts_json else {}
+        except (json.JSONDecodeError, TypeError):
+            return {}
@@ -1,21 +1,34 @@
 from app.db import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
+from app.models.metric_definition import MetricDefinition
 
 class Session(Base):
     __tablename__ = "sessions"
 
     id = Column(Integer, primary_key=True, index=True)
-    player_id = Column(String, ForeignKey("players.id"), nullable=False)
+    player_id = Column(String, ForeignKey("players.id"), nullable=False, index=True)
     date = Column(DateTime, nullable=False)
     session_type = Column(String, nullable=False)
     notes = Column(String, nullable=True)
 
+    __table_args__ = (
+        Index("ix_sessions_player_date", "player_id", "date"),
+    )
+
+    # Session-level (averaged) metrics; raw imported pitches live in pitch_metrics
     metrics = relationship(
         "SessionMetric",
+        primaryjoin="and_(Session.id == SessionMetric.session_id, SessionMetric.pitch_no.is_(None))",
         back_populates="session",
         cascade="all, delete-orphan"
     )
+    pitch_metrics = relationship(
+        "SessionMetric",
+        primaryjoin="and_(Session.id == SessionMetric.session_id, SessionMetric.pitch_no.isnot(None))",
+        cascade="all, delete-orphan",
+        overlaps="metrics,session"
+    )
     media = relationship(
         "SessionMedia",
         back_populates="session",
@@ -28,15 +41,44 @@ class SessionMetric(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
+    metric_id = Column(Integer, ForeignKey("metric_definitions.id"), nullable=False)
 
-    source = Column(String, nullable=False)        # rapsodo, trackman, etc
     pitch_type = Column(String, nullable=True)     # Fastball, Cutter, etc
+    pitch_no = Column(Integer, nullable=True)      # set on raw per-pitch rows, NULL on session averages
+
+    value = Column(Float, nullable=True)           # numeric values
+    value_text = Column(String, nullable=True)     # anything that isn't a number (e.g. "1:30" spin direction)
 
-    metric_name = Column(String, nullable=False)
-    metric_value = Column(String, nullable=False)
-    unit = Column(String, nullable=True)
+    __table_args__ = (
+        Index("ix_session_metrics_session_metric", "session_id", "metric_id"),
+        Index("ix_session_metrics_metric_value", "metric_id", "value"),
+    )
 
     session = relationship("Session", back_populates="metrics")
+    definition = relationship(MetricDefinition, lazy="joined", innerjoin=True)
+
+    # Read-only views in the shape the API has always returned
+    @property
+    def source(self):
+        return self.definition.source
+
+    @property
+    def metric_name(self):
+        return self.definition.name
+
+    @property
+    def unit(self):
+        return self.definition.unit or None
+
+    @property
+    def metric_value(self):
+        return self.format_value(self.value, self.value_text)
+
+    @staticmethod
+    def format_value(value, value_text):
+        if value is None:
+            return value_text
+        return format(value, ".15g")
 
 
 
@@ -0,0 +1,61 @@
+# rebuild_media_derivatives.py
+"""
+Render derivatives for every stored blob that has none yet, e.g. after
+migrate_media_store or when the upload-time queue was full.
+
+    python -m app.rebuild_media_derivatives
+"""
+from sqlalchemy import exists
+
+from app.db import Base, SessionLocal, engine
+from app.models.media_blob import MediaBlob, MediaDerivative
+from app.services import media_derivatives, media_store
+
+# Import models so SQLAlchemy knows about them
+import app.models.tag
+import app.models.drill
+import app.models.concept
+import app.models.concept_relation
+import app.models.concept_version
+import app.models.concept_link
+import app.models.concept_tag
+import app.models.content_version
+import app.models.player
+import app.models.player_history
+import app.models.session
+
+BATCH_SIZE = 50
+
+
+def run_rebuild():
+    print("Connecting to database...")
+    try:
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            blobs = [
+                media_store.Blob(b.sha256, b.ext, b.size, b.content_type)
+                for b in db.query(MediaBlob).filter(~exists().where(MediaDerivative.sha256 == MediaBlob.sha256))
+            ]
+            print(f"Rendering derivatives for {len(blobs)} blobs...")
+            rendered = 0
+            for start in range(0, len(blobs), BATCH_SIZE):
+                results = media_derivatives.render_all(blobs[start:start + BATCH_SIZE])
+                for sha256, variants in results.items():
+                    if variants:
+                        media_derivatives.record(db, sha256, variants)
+                        rendered += 1
+                db.commit()
+                print(f"   {min(start + BATCH_SIZE, len(blobs))}/{len(blobs)}")
+        finally:
+            db.close()
+            media_derivatives.shutdown()
+
+        print(f"\n🎉 Derivatives rendered for {rendered} blobs.")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_rebuild()
@@ -0,0 +1,49 @@
+# rebuild_metric_rollups.py
+from sqlalchemy import text
+from app.db import Base, SessionLocal, engine
+from app.services import metric_rollups
+
+# Import models so SQLAlchemy knows about them
+import app.models.tag
+import app.models.drill
+import app.models.concept
+import app.models.concept_relation
+import app.models.concept_version
+import app.models.concept_link
+import app.models.concept_tag
+import app.models.player
+import app.models.player_history
+import app.models.player_summary
+import app.models.metric_definition
+import app.models.metric_rollup
+import app.models.session
+
+
+def run_rebuild():
+    print("Connecting to database...")
+    try:
+        Base.metadata.create_all(bind=engine)
+        with engine.connect() as conn:
+            print("Creating leaderboard index on metric_rollups...")
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_metric_rollups_metric_period "
+                "ON metric_rollups (metric_id, period, pitch_type)"
+            ))
+            conn.commit()
+            print("✅ Index ready.")
+
+        db = SessionLocal()
+        try:
+            count = metric_rollups.rebuild(db)
+            db.commit()
+        finally:
+            db.close()
+
+        print(f"\n🎉 Metric rollups rebuilt: {count} cells.")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_rebuild()
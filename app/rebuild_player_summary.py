@@ -0,0 +1,44 @@
+# rebuild_player_summary.py
+from sqlalchemy import text
+from app.db import Base, SessionLocal, engine
+from app.services import player_summary
+
+# Import models so SQLAlchemy knows about them
+import app.models.tag
+import app.models.drill
+import app.models.concept
+import app.models.concept_relation
+import app.models.concept_version
+import app.models.concept_link
+import app.models.concept_tag
+import app.models.player
+import app.models.player_history
+import app.models.player_summary
+import app.models.session
+
+
+def run_rebuild():
+    print("Connecting to database...")
+    try:
+        Base.metadata.create_all(bind=engine)
+        with engine.connect() as conn:
+            print("Creating index on sessions.player_id...")
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sessions_player_id ON sessions (player_id)"))
+            conn.commit()
+            print("✅ Index ready.")
+
+        db = SessionLocal()
+        try:
+            count = player_summary.rebuild(db)
+            db.commit()
+        finally:
+            db.close()
+
+        print(f"\n🎉 Player summaries rebuilt for {count} players.")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_rebuild()
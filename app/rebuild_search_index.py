@@ -0,0 +1,39 @@
+# rebuild_search_index.py
+from app.db import SessionLocal, engine
+from app.services import search_index
+
+# Import models so the relationship mappers are configured
+import app.models.tag
+import app.models.drill
+import app.models.concept
+import app.models.concept_relation
+import app.models.concept_version
+import app.models.concept_link
+import app.models.concept_tag
+import app.models.player
+import app.models.player_history
+import app.models.session
+
+
+def run_rebuild():
+    print("Connecting to database...")
+    try:
+        with engine.begin() as conn:
+            if search_index.ensure_search_index(conn):
+                print("✅ Search index table created.")
+
+        db = SessionLocal()
+        try:
+            count = search_index.rebuild(db)
+            db.commit()
+        finally:
+            db.close()
+
+        print(f"\n🎉 Search index rebuilt with {count} entries.")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_rebuild()
@@ -1,37 +1,53 @@
 import uuid
 import os
-import shutil
 import json
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, literal, union_all, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from datetime import datetime
+from typing import Dict, List, Optional, Literal
 from pydantic import BaseModel, ConfigDict
 
-from app.db import get_db
+from app.db import get_db, SessionLocal
 from app.models.concept import Concept
+from app.models.concept_relation import ConceptRelation
 from app.models.drill import Drill
+from app.models.player_drill import PlayerDrill
 from app.models.tag import Tag
+from app.services import search_index, response_cache
+from app.services import tags as tag_service
+from app.services import concept_graph
+from app.services import concept_versions
+from app.services import encyclopedia_io
+from app.services import entries
+from app.services import media_derivatives, media_store
+from app.services import player_summary
+from app.services.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/concepts", tags=["Encyclopedia"])
 
 # -----------------------------
 # Upload config
 # -----------------------------
+# Legacy upload directory; new files go to the media store
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-BACKEND_URL = "http://localhost:8000"
+BACKEND_URL = media_store.BACKEND_URL
 
 
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    file_ext = os.path.splitext(file.filename)[1]
-    filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
+async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    blob = await media_store.put_upload(db, file)
+    media_derivatives.schedule(blob)
 
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    return {"filename": filename, "url": f"{BACKEND_URL}/{UPLOAD_DIR}/{filename}"}
+    return {
+        "filename": blob.name,
+        "url": blob.url,
+        "size": blob.size,
+        "sha256": blob.sha256,
+    }
 
 
 # -----------------------------
@@ -55,6 +71,7 @@ class ConceptUpdate(BaseModel):
     tags: Optional[List[str]] = None
     media_files: Optional[List[str]] = None
     history: Optional[List[dict]] = None  # NEW
+    change_summary: Optional[str] = None  # stored on the body revision
 
 
 class ConceptOut(BaseModel):
@@ -65,12 +82,65 @@ class ConceptOut(BaseModel):
     category: str
     tags: List[str]
     media_files: List[str] = []
+    media_variants: Dict[str, Dict[str, str]] = {}  # media URL -> {thumb/medium/poster: URL}
     history: List[dict] = []  # NEW
     type: str = "concept"
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class SearchHit(ConceptOut):
+    snippet: str = ""
+    score: float = 0.0
+
+
+class VersionOut(BaseModel):
+    version_no: int
+    kind: str
+    updated_at: Optional[datetime] = None
+    updated_by: Optional[str] = None
+    change_summary: Optional[str] = None
+    body_length: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class VersionDetail(VersionOut):
+    body: str
+
+
+class VersionDiff(BaseModel):
+    from_version: int
+    to_version: int
+    diff: str
+
+
+class RelationCreate(BaseModel):
+    to_concept_id: str
+    relation_type: Literal["related", "prerequisite", "counterpoint", "builds_on"]
+
+
+class GraphNode(BaseModel):
+    id: str
+    title: str
+    category: str
+    depth: int
+
+
+class GraphEdge(BaseModel):
+    from_concept_id: str
+    to_concept_id: str
+    relation_type: str
+
+
+class ConceptGraphOut(BaseModel):
+    root: str
+    nodes: List[GraphNode]
+    edges: List[GraphEdge]
+    curriculum: List[str] = []      # prerequisites first
+    cycles: List[List[str]] = []    # prerequisite/builds_on loops, if any
+
+
 # -----------------------------
 # Helper to generate full URLs
 # -----------------------------
@@ -80,6 +150,73 @@ def to_media_urls(file_list: List[str]) -> List[str]:
             for f in file_list]
 
 
+# -----------------------------
+# Serialization helpers
+# -----------------------------
+def _media_variants(db: Session, concepts=(), drills=()) -> dict:
+    """Derivative URLs for the media of a batch of entries, in one query."""
+    urls = [url for c in concepts for url in to_media_urls(json.loads(c.media_files) if c.media_files else [])]
+    urls += [url for d in drills for url in to_media_urls(d.all_media)]
+    return media_derivatives.variants_for(db, urls)
+
+
+def _concept_out(c: Concept, variants: dict = None) -> ConceptOut:
+    media_list = json.loads(c.media_files) if c.media_files else []
+    media_urls = to_media_urls(media_list)
+    # Parse history string from SQLite back to List[dict]
+    hist_list = json.loads(c.history) if c.history else []
+    return ConceptOut(
+        id=c.id,
+        title=c.title,
+        summary=c.summary or "",
+        body=c.body or "",
+        category=c.category or "General",
+        tags=[t.name for t in c.tags],
+        media_files=media_urls,
+        media_variants={url: variants[url] for url in media_urls if url in (variants or {})},
+        history=hist_list,
+        type="concept"
+    )
+
+
+def _drill_out(d: Drill, summary: str = "Drill", variants: dict = None) -> ConceptOut:
+    d_hist = json.loads(d.history) if d.history else []
+    media_urls = to_media_urls(d.all_media)
+    return ConceptOut(
+        id=d.id,
+        title=d.title,
+        summary=summary,
+        body=d.description or "",
+        category=d.category or "Drills",
+        tags=[t.name for t in d.tags],
+        media_files=media_urls,
+        media_variants={url: variants[url] for url in media_urls if url in (variants or {})},
+        history=d_hist,
+        type="drill"
+    )
+
+
+def _load_entries(db: Session, concept_ids: List[str], drill_ids: List[str]):
+    """Load concepts and drills (with tags) by id in bulk, returned as id -> row dicts."""
+    concepts = {}
+    if concept_ids:
+        concepts = {
+            c.id: c
+            for c in db.query(Concept)
+            .options(selectinload(Concept.tags))
+            .filter(Concept.id.in_(concept_ids))
+        }
+    drills = {}
+    if drill_ids:
+        drills = {
+            d.id: d
+            for d in db.query(Drill)
+            .options(selectinload(Drill.tags))
+            .filter(Drill.id.in_(drill_ids))
+        }
+    return concepts, drills
+
+
 # -----------------------------
 # Routes
 # -----------------------------
@@ -88,87 +225,191 @@ def get_all_tags(db: Session = Depends(get_db)):
     tags = db.query(Tag).all()
     return [{"id": t.id, "name": t.name} for t in tags]
 
-@router.get("/", response_model=List[ConceptOut])
-def list_encyclopedia(db: Session = Depends(get_db)):
+
+def _encyclopedia_page(db: Session, limit: Optional[int], cursor: Optional[str],
+                       entry_type: Optional[str], category: Optional[str]):
+    """
+    Concepts and drills merged into one list ordered by (title, id).
+    Returns (entries, next_cursor); next_cursor is None on the last page.
+    """
+    # 1. Pick the ids of this page from both tables in one ordered query
+    concept_ids = select(Concept.id, Concept.title, literal("concept").label("type"))
+    drill_ids = select(Drill.id, Drill.title, literal("drill").label("type"))
+    if category:
+        concept_ids = concept_ids.where(Concept.category.like(f"{category}%"))
+        drill_ids = drill_ids.where(Drill.category.like(f"{category}%"))
+
+    if entry_type == "concept":
+        merged = concept_ids.subquery()
+    elif entry_type == "drill":
+        merged = drill_ids.subquery()
+    else:
+        merged = union_all(concept_ids, drill_ids).subquery()
+
+    page_q = select(merged.c.id, merged.c.title, merged.c.type)
+    if cursor:
+        after_title, after_id = decode_cursor(cursor, 2)
+        page_q = page_q.where(
+            or_(
+                merged.c.title > after_title,
+                and_(merged.c.title == after_title, merged.c.id > after_id),
+            )
+        )
+    page_q = page_q.order_by(merged.c.title, merged.c.id)
+    if limit:
+        # Fetch one extra row to know whether there is a next page
+        page_q = page_q.limit(limit + 1)
+
+    page = db.execute(page_q).all()
+    next_cursor = None
+    if limit and len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1].title, page[-1].id)
+
+    # 2. Bulk-load the rows and their tags (one query per table + one per tag relation)
+    concepts, drills = _load_entries(
+        db,
+        [row.id for row in page if row.type == "concept"],
+        [row.id for row in page if row.type == "drill"],
+    )
+
+    # 3. Serialize in page order
+    variants = _media_variants(db, concepts.values(), drills.values())
     results = []
+    for row in page:
+        if row.type == "concept" and row.id in concepts:
+            results.append(_concept_out(concepts[row.id], variants))
+        elif row.type == "drill" and row.id in drills:
+            results.append(_drill_out(drills[row.id], summary="Drill Exercise", variants=variants))
 
-    # 1. Fetch Concepts
-    concepts = db.query(Concept).all()
-    for c in concepts:
-        media_list = json.loads(c.media_files) if c.media_files else []
-        # Parse history string from SQLite back to List[dict]
-        hist_list = json.loads(c.history) if (hasattr(c, 'history') and c.history) else []
-
-        results.append(ConceptOut(
-            id=c.id,
-            title=c.title,
-            summary=c.summary or "",
-            body=c.body or "",
-            category=c.category or "General",
-            tags=[t.name for t in c.tags],
-            media_files=to_media_urls(media_list),
-            history=hist_list,
-            type="concept"
-        ))
-
-    # 2. Fetch Drills
-    drills = db.query(Drill).all()
-    for d in drills:
-        # Check if drills have history too
-        d_hist = json.loads(d.history) if (hasattr(d, 'history') and d.history) else []
-        results.append(ConceptOut(
-            id=d.id,
-            title=d.title,
-            summary="Drill Exercise",
-            body=d.description or "",
-            category=d.category or "Drills",
-            tags=[t.name for t in d.tags],
-            media_files=to_media_urls(d.all_media),
-            history=d_hist,
-            type="drill"
-        ))
+    return results, next_cursor
 
-    return results
 
+@router.get("/", response_model=List[ConceptOut])
+def list_encyclopedia(
+        request: Request,
+        limit: Optional[int] = Query(None, ge=1, le=500, description="Page size (omit for the full list)"),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+        type: Optional[str] = Query(None, pattern="^(concept|drill)$", description="Only concepts or only drills"),
+        category: Optional[str] = Query(None, description="Category prefix filter"),
+        db: Session = Depends(get_db),
+):
+    """
+    Concepts and drills merged into one list ordered by (title, id).
 
-@router.get("/{concept_id}", response_model=ConceptOut)
-def get_entry(concept_id: str, db: Session = Depends(get_db)):
-    # Check Concepts
-    concept = db.query(Concept).filter(Concept.id == concept_id).first()
-    if concept:
-        media_list = json.loads(concept.media_files) if concept.media_files else []
-        hist_list = json.loads(concept.history) if (hasattr(concept, 'history') and concept.history) else []
-        return ConceptOut(
-            id=concept.id,
-            title=concept.title,
-            summary=concept.summary or "",
-            body=concept.body or "",
-            category=concept.category or "General",
-            tags=[t.name for t in concept.tags],
-            media_files=to_media_urls(media_list),
-            history=hist_list,
-            type="concept"
-        )
+    Pages are keyset-based: pass the X-Next-Cursor header of one page as
+    `cursor` to get the next. Rows and tags are loaded in bulk, so a page
+    costs the same handful of queries regardless of its size. Responses are
+    cached until the encyclopedia changes and carry an ETag.
+    """
+    def build():
+        results, next_cursor = _encyclopedia_page(db, limit, cursor, type, category)
+        return results, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
 
-    # Check Drills
-    drill = db.query(Drill).filter(Drill.id == concept_id).first()
-    if drill:
-        d_hist = json.loads(drill.history) if (hasattr(drill, 'history') and drill.history) else []
-        return ConceptOut(
-            id=drill.id,
-            title=drill.title,
-            summary="Drill",
-            body=drill.description or "",
-            category=drill.category or "Drills",
-            tags=[t.name for t in drill.tags],
-            media_files=to_media_urls(drill.all_media),
-            history=d_hist,
-            type="drill"
-        )
+    return response_cache.cached_json_response(request, db, build)
+
+
+@router.get("/search", response_model=List[SearchHit])
+def search_encyclopedia(
+        query: Optional[str] = Query(None, description="Search term"),
+        category: Optional[str] = Query(None, description="Category filter"),
+        tags: Optional[List[str]] = Query(None, description="Only entries carrying any of these tags"),
+        limit: int = Query(50, ge=1, le=200),
+        offset: int = Query(0, ge=0),
+        db: Session = Depends(get_db),
+):
+    """
+    Full-text search over concepts and drills, ranked by bm25.
+    Every word is prefix-matched; `snippet` highlights hits with <mark> tags.
+    """
+    hits = search_index.search(db, query, category=category, tags=tags, limit=limit, offset=offset)
+    concepts, drills = _load_entries(
+        db,
+        [h.entry_id for h in hits if h.entry_type == "concept"],
+        [h.entry_id for h in hits if h.entry_type == "drill"],
+    )
+
+    variants = _media_variants(db, concepts.values(), drills.values())
+    results = []
+    for h in hits:
+        if h.entry_type == "concept" and h.entry_id in concepts:
+            out = _concept_out(concepts[h.entry_id], variants)
+        elif h.entry_type == "drill" and h.entry_id in drills:
+            out = _drill_out(drills[h.entry_id], variants=variants)
+        else:
+            continue
+        # bm25 is "lower is better"; flip it so clients can sort descending
+        results.append(SearchHit(**out.model_dump(), snippet=h.snippet or "", score=-h.score or 0.0))
+
+    return results
+
+
+def _entry_out(concept_id: str, db: Session) -> ConceptOut:
+    entry_type, entry = entries.load_entry(db, concept_id)
+    if entry_type == entries.CONCEPT:
+        return _concept_out(entry, _media_variants(db, concepts=[entry]))
+    if entry_type == entries.DRILL:
+        return _drill_out(entry, variants=_media_variants(db, drills=[entry]))
 
     raise HTTPException(status_code=404, detail="Entry not found")
 
 
+@router.get("/export")
+def export_encyclopedia():
+    """
+    Stream the whole library (tags, concepts, drills, relations, links,
+    versions) as NDJSON. Rows are paged out of the database as the client
+    reads, so memory use does not grow with the library.
+    """
+    def stream():
+        # The request-scoped session is closed before a streaming body is
+        # sent, so the generator owns its session.
+        db = SessionLocal()
+        try:
+            yield from encyclopedia_io.export_lines(db)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="encyclopedia.ndjson"'},
+    )
+
+
+@router.post("/import")
+def import_encyclopedia(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """
+    Load an NDJSON export, upserting every row by id. The upload is read
+    line by line and written in batches, each batch in one transaction.
+    """
+    error = None
+    try:
+        counts = encyclopedia_io.import_lines(db, file.file)
+    except ValueError as e:
+        error = HTTPException(status_code=400, detail=str(e))
+    except IntegrityError as e:
+        error = HTTPException(status_code=409, detail=f"Import conflicts with existing data: {e.orig}")
+    if error:
+        db.rollback()
+
+    # Batches before a failing one are already committed; index them either way
+    search_index.rebuild(db)
+    media_store.rebuild_refs(db)
+    response_cache.bump(db)
+    db.commit()
+    if error:
+        raise error
+    return {"message": "Import complete", "counts": counts}
+
+
+@router.get("/{concept_id}", response_model=ConceptOut)
+def get_entry(concept_id: str, request: Request, db: Session = Depends(get_db)):
+    return response_cache.cached_json_response(
+        request, db, lambda: (_entry_out(concept_id, db), {})
+    )
+
+
 @router.post("/", response_model=ConceptOut)
 def create_concept(concept_in: ConceptCreate, db: Session = Depends(get_db)):
     try:
@@ -184,17 +425,15 @@ def create_concept(concept_in: ConceptCreate, db: Session = Depends(get_db)):
             media_files=media_json,
             history=history_json  # NEW
         )
-        for tag_name in concept_in.tags:
-            tag = db.query(Tag).filter(Tag.name == tag_name).first()
-            if not tag:
-                tag = Tag(name=tag_name)
-                db.add(tag)
-                db.commit()
-                db.refresh(tag)
-            new_concept.tags.append(tag)
+        new_concept.tags = tag_service.resolve_tags(db, concept_in.tags)
         db.add(new_concept)
+        media_store.set_refs(db, media_store.CONCEPT, {new_concept.id: concept_in.media_files or []})
+        concept_versions.record_version(db, new_concept.id, new_concept.body, change_summary="Created")
+        search_index.index_concept(db, new_concept)
+        response_cache.bump(db)
         db.commit()
         db.refresh(new_concept)
+        entries.remember(new_concept.id, entries.CONCEPT)
 
         return ConceptOut(
             id=new_concept.id,
@@ -204,6 +443,7 @@ def create_concept(concept_in: ConceptCreate, db: Session = Depends(get_db)):
             category=new_concept.category,
             tags=[t.name for t in new_concept.tags],
             media_files=to_media_urls(concept_in.media_files or []),
+            media_variants=_media_variants(db, concepts=[new_concept]),
             history=concept_in.history or [],
             type="concept"
         )
@@ -214,25 +454,18 @@ def create_concept(concept_in: ConceptCreate, db: Session = Depends(get_db)):
 
 @router.put("/{concept_id}", response_model=ConceptOut)
 def update_concept(concept_id: str, concept_in: ConceptUpdate, db: Session = Depends(get_db)):
-    # Look in both tables
-    target = db.query(Concept).filter(Concept.id == concept_id).first()
-    is_drill = False
-    if not target:
-        target = db.query(Drill).filter(Drill.id == concept_id).first()
-        is_drill = True
-
+    entry_type, target = entries.load_entry(db, concept_id)
     if not target:
         raise HTTPException(status_code=404, detail="Entry not found")
+    is_drill = entry_type == entries.DRILL
 
     update_data = concept_in.model_dump(exclude_unset=True)
+    change_summary = update_data.pop("change_summary", None)
+    previous_body = None if is_drill else target.body
 
     # Handle Tags
     if "tags" in update_data:
-        tag_names = update_data.pop("tags")
-        target.tags = []
-        for name in tag_names:
-            tag = db.query(Tag).filter(Tag.name == name).first() or Tag(name=name)
-            target.tags.append(tag)
+        target.tags = tag_service.resolve_tags(db, update_data.pop("tags"))
 
     # Handle JSON fields
         # Handle JSON fields
@@ -249,6 +482,9 @@ def update_concept(concept_id: str, concept_in: ConceptUpdate, db: Session = Dep
             else:
                 # For Concepts
                 target.media_files = m_files_json
+            media_store.set_refs(db, entry_type, {
+                target.id: media_store.drill_urls(target) if is_drill else media_store.concept_urls(target)
+            })
 
     if "history" in update_data:
         setattr(target, "history", json.dumps(update_data.pop("history")))
@@ -260,64 +496,190 @@ def update_concept(concept_id: str, concept_in: ConceptUpdate, db: Session = Dep
         elif hasattr(target, key):
             setattr(target, key, value)
 
-    db.commit()
-    return get_entry(concept_id, db)
+    if is_drill:
+        search_index.index_drill(db, target)
+    else:
+        if "body" in update_data:
+            concept_versions.record_version(
+                db, target.id, target.body, previous_text=previous_body, change_summary=change_summary
+            )
+        search_index.index_concept(db, target)
+    response_cache.bump(db)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent edit took the same version_no
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Entry was modified concurrently; reload and retry")
+    return _entry_out(concept_id, db)
 
 
 @router.delete("/{concept_id}")
 def delete_entry(concept_id: str, db: Session = Depends(get_db)):
-    # 1. Try Concepts
-    concept = db.query(Concept).filter(Concept.id == concept_id).first()
-    if concept:
-        db.delete(concept)
-        db.commit()
-        return {"message": "Concept deleted successfully"}
-
-    # 2. Try Drills
-    drill = db.query(Drill).filter(Drill.id == concept_id).first()
-    if drill:
-        db.delete(drill)
+    entry_type, entry = entries.load_entry(db, concept_id, with_tags=False)
+    if entry:
+        # Deleting a drill cascades to its assignments; those players' summaries change
+        player_ids = []
+        if entry_type == entries.DRILL:
+            player_ids = [pid for (pid,) in db.query(PlayerDrill.player_id).filter(PlayerDrill.drill_id == concept_id)]
+        db.delete(entry)
+        for player_id in player_ids:
+            player_summary.refresh(db, player_id)
+        media_store.drop_refs(db, entry_type, [concept_id])
+        search_index.remove_entry(db, concept_id)
+        response_cache.bump(db)
         db.commit()
+        entries.forget(concept_id)
+        if entry_type == entries.CONCEPT:
+            return {"message": "Concept deleted successfully"}
         return {"message": "Drill deleted successfully"}
 
     raise HTTPException(status_code=404, detail="Entry not found")
 
 
-@router.get("/search", response_model=List[ConceptOut])
-def search_encyclopedia(
-        query: Optional[str] = Query(None, description="Search term"),
-        category: Optional[str] = Query(None, description="Category filter"),
+# -----------------------------
+# Concept relations / graph
+# -----------------------------
+@router.get("/{concept_id}/graph", response_model=ConceptGraphOut)
+def get_concept_graph(
+        concept_id: str,
+        depth: int = Query(3, ge=1, le=25, description="Maximum number of hops"),
+        types: Optional[List[str]] = Query(None, description="Relation types to follow (default: all)"),
+        direction: str = Query("out", pattern="^(out|in|both)$",
+                               description="out = what this builds on, in = what builds on this, both = neighborhood"),
         db: Session = Depends(get_db),
 ):
-    results = []
-    search_term = f"%{query}%" if query else "%"
+    """
+    Walk the relation graph around a concept in one request.
+
+    Edges read "from <type> to": (A -> B, prerequisite) means B is a
+    prerequisite of A, so direction=out returns the prerequisite chain.
+    `curriculum` lists the returned concepts prerequisites-first and
+    `cycles` reports any prerequisite/builds_on loops among them.
+    """
+    root = db.query(Concept.id).filter(Concept.id == concept_id).first()
+    if not root:
+        raise HTTPException(status_code=404, detail="Concept not found")
+
+    types = types or list(concept_graph.RELATION_TYPES)
+    unknown = [t for t in types if t not in concept_graph.RELATION_TYPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown relation type(s): {', '.join(unknown)}")
+
+    distances = concept_graph.walk(db, concept_id, depth, types, direction)
+    edges = concept_graph.edges_between(db, list(distances), types)
+    rows = (
+        db.query(Concept.id, Concept.title, Concept.category)
+        .filter(Concept.id.in_(list(distances)))
+        .all()
+    )
+    titles = {row.id: row.title for row in rows}
 
-    q_c = db.query(Concept).filter(
-        (Concept.title.ilike(search_term)) | (Concept.body.ilike(search_term))
+    nodes = sorted(
+        (GraphNode(id=row.id, title=row.title, category=row.category or "General", depth=distances[row.id])
+         for row in rows),
+        key=lambda n: (n.depth, n.title, n.id),
     )
-    if category: q_c = q_c.filter(Concept.category.like(f"{category}%"))
-
-    for c in q_c.all():
-        media_list = json.loads(c.media_files) if c.media_files else []
-        hist_list = json.loads(c.history) if (hasattr(c, 'history') and c.history) else []
-        results.append(ConceptOut(
-            id=c.id, title=c.title, summary=c.summary or "", body=c.body or "",
-            category=c.category or "General", tags=[t.name for t in c.tags],
-            media_files=to_media_urls(media_list), history=hist_list, type="concept"
-        ))
-
-    q_d = db.query(Drill).filter(
-        (Drill.title.ilike(search_term)) | (Drill.description.ilike(search_term))
+    ordering_edges = [e for e in edges if e[2] in concept_graph.ORDERING_TYPES]
+
+    return ConceptGraphOut(
+        root=concept_id,
+        nodes=nodes,
+        edges=[GraphEdge(from_concept_id=f, to_concept_id=t, relation_type=r) for f, t, r in edges],
+        curriculum=concept_graph.curriculum_order(list(titles), ordering_edges, tie_break=titles),
+        cycles=concept_graph.find_cycles(list(titles), ordering_edges),
     )
-    if category: q_d = q_d.filter(Drill.category == category)
 
-    for d in q_d.all():
-        d_hist = json.loads(d.history) if (hasattr(d, 'history') and d.history) else []
-        results.append(ConceptOut(
-            id=d.id, title=d.title, summary="Drill", body=d.description or "",
-            category=d.category or "Drills", tags=[t.name for t in d.tags],
-            media_files=to_media_urls(d.all_media), history=d_hist, type="drill"
-        ))
 
-    return results
+@router.post("/{concept_id}/relations", response_model=GraphEdge)
+def add_relation(concept_id: str, relation_in: RelationCreate, db: Session = Depends(get_db)):
+    ids = {concept_id, relation_in.to_concept_id}
+    found = db.query(Concept.id).filter(Concept.id.in_(ids)).count()
+    if found != len(ids):
+        raise HTTPException(status_code=404, detail="Concept not found")
+    if concept_id == relation_in.to_concept_id:
+        raise HTTPException(status_code=400, detail="A concept cannot relate to itself")
+
+    # Refuse edges that would close a prerequisite loop
+    if relation_in.relation_type in concept_graph.ORDERING_TYPES and concept_graph.reaches(
+            db, relation_in.to_concept_id, concept_id, concept_graph.ORDERING_TYPES):
+        raise HTTPException(status_code=409, detail="Relation would create a prerequisite cycle")
+
+    relation = (
+        db.query(ConceptRelation)
+        .filter_by(from_concept_id=concept_id, to_concept_id=relation_in.to_concept_id)
+        .first()
+    )
+    if relation:
+        relation.relation_type = relation_in.relation_type
+    else:
+        relation = ConceptRelation(
+            from_concept_id=concept_id,
+            to_concept_id=relation_in.to_concept_id,
+            relation_type=relation_in.relation_type,
+        )
+        db.add(relation)
+    db.commit()
+
+    return GraphEdge(
+        from_concept_id=concept_id,
+        to_concept_id=relation_in.to_concept_id,
+        relation_type=relation_in.relation_type,
+    )
+
+
+@router.delete("/{concept_id}/relations/{to_concept_id}")
+def remove_relation(concept_id: str, to_concept_id: str, db: Session = Depends(get_db)):
+    deleted = (
+        db.query(ConceptRelation)
+        .filter_by(from_concept_id=concept_id, to_concept_id=to_concept_id)
+        .delete()
+    )
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Relation not found")
+    db.commit()
+    return {"message": "Relation removed successfully"}
+
+
+# -----------------------------
+# Concept revisions
+# -----------------------------
+def _require_concept(concept_id: str, db: Session):
+    if not db.query(Concept.id).filter(Concept.id == concept_id).first():
+        raise HTTPException(status_code=404, detail="Concept not found")
+
+
+@router.get("/{concept_id}/versions", response_model=List[VersionOut])
+def list_concept_versions(concept_id: str, db: Session = Depends(get_db)):
+    """Revision history, newest first. Bodies are not loaded."""
+    _require_concept(concept_id, db)
+    return [VersionOut.model_validate(row) for row in concept_versions.list_versions(db, concept_id)]
+
+
+@router.get("/{concept_id}/versions/diff", response_model=VersionDiff)
+def diff_concept_versions(
+        concept_id: str,
+        from_version: int = Query(..., ge=1),
+        to_version: int = Query(..., ge=1),
+        db: Session = Depends(get_db),
+):
+    _require_concept(concept_id, db)
+    old = concept_versions.reconstruct(db, concept_id, from_version)
+    new = concept_versions.reconstruct(db, concept_id, to_version)
+    if old is None or new is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    diff = concept_versions.unified_diff(old, new, f"v{from_version}", f"v{to_version}")
+    return VersionDiff(from_version=from_version, to_version=to_version, diff="".join(diff))
+
+
+@router.get("/{concept_id}/versions/{version_no}", response_model=VersionDetail)
+def get_concept_version(concept_id: str, version_no: int, db: Session = Depends(get_db)):
+    _require_concept(concept_id, db)
+    meta = concept_versions.version_meta(db, concept_id, version_no)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Version not found")
 
+    body = concept_versions.reconstruct(db, concept_id, version_no)
+    return VersionDetail(**VersionOut.model_validate(meta).model_dump(), body=body)
@@ -1,6 +1,3 @@
-import os
-import uuid
-import shutil
 import json
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session, joinedload
@@ -8,15 +5,14 @@ from typing import List
 
 from app.db import get_db
 from app.models.drill import Drill
-from app.models.tag import Tag
 from app.schemas.drill import DrillRead
+from app.services import search_index, response_cache
+from app.services import tags as tag_service
+from app.services import entries
+from app.services import media_derivatives, media_store
 
 router = APIRouter(prefix="/drills", tags=["drills"])
 
-UPLOAD_DIR = "uploaded_videos"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-
 # Helper to ensure media_files is a list before sending to Pydantic
 def format_drill_for_response(drill: Drill):
     if isinstance(drill.media_files, str):
@@ -50,27 +46,17 @@ def create_drill(
     )
 
     # Handle tags
-    tags = []
-    for tag_name in [t.strip() for t in tag_names.split(",") if t.strip()]:
-        tag = db.query(Tag).filter(Tag.name == tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.add(tag)
-            db.commit()
-            db.refresh(tag)
-        tags.append(tag)
-    db_drill.tags = tags
+    db_drill.tags = tag_service.resolve_tags(db, tag_names.split(","))
 
     # Handle media/video
     media_list = []
+    blob = None
     if video_file:
-        filename = f"{uuid.uuid4()}_{video_file.filename}"
-        filepath = os.path.join(UPLOAD_DIR, filename)
-        with open(filepath, "wb") as buffer:
-            shutil.copyfileobj(video_file.file, buffer)
+        # Sync route: already off the event loop, copy in place
+        blob = media_store.put(db, video_file.file, video_file.filename, video_file.content_type)
         # Store in both for compatibility
-        db_drill.video_url = filepath
-        media_list.append(filepath)
+        db_drill.video_url = blob.url
+        media_list.append(blob.url)
 
     if video_link:
         # If no file was uploaded, set video_url to the link
@@ -82,8 +68,15 @@ def create_drill(
 
     # Save drill
     db.add(db_drill)
+    db.flush()  # assigns the id the search index needs
+    media_store.set_refs(db, media_store.DRILL, {db_drill.id: media_list})
+    search_index.index_drill(db, db_drill)
+    response_cache.bump(db)
     db.commit()
     db.refresh(db_drill)
+    entries.remember(db_drill.id, entries.DRILL)
+    if blob:
+        media_derivatives.schedule(blob)
 
     return format_drill_for_response(db_drill)
 
@@ -117,17 +110,9 @@ def update_drill_tags(drill_id: str, tag_names: List[str], db: Session = Depends
     if not drill:
         raise HTTPException(status_code=404, detail="Drill not found")
 
-    tags = []
-    for tag_name in tag_names:
-        tag = db.query(Tag).filter(Tag.name == tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.add(tag)
-            db.commit()
-            db.refresh(tag)
-        tags.append(tag)
-
-    drill.tags = tags
+    drill.tags = tag_service.resolve_tags(db, tag_names)
+    search_index.index_drill(db, drill)
+    response_cache.bump(db)
     db.commit()
     db.refresh(drill)
     return format_drill_for_response(drill)
\ No newline at end of file
@@ -0,0 +1,128 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from datetime import date, datetime
+from typing import List, Optional
+
+from app.db import get_db
+from app.models.player import Player
+from app.services import leaderboards
+
+router = APIRouter(prefix="/leaderboards", tags=["leaderboards"])
+
+
+def _player_out(row):
+    player_id, first_name, last_name, team, position = row[:5]
+    return {
+        "player_id": player_id,
+        "first_name": first_name,
+        "last_name": last_name,
+        "team": team,
+        "position": position,
+    }
+
+
+def _check_range(start, end):
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+
+# -------------------------------
+# Leaderboard
+# -------------------------------
+@router.get("/")
+def get_leaderboard(
+    metric: str = Query(..., description="Metric name, e.g. Velocity"),
+    stat: str = Query("max", pattern="^(max|mean|value)$",
+                      description="Rank players by their max or mean, or rank individual values"),
+    source: Optional[str] = None,
+    pitch_type: Optional[str] = None,
+    team: Optional[str] = None,
+    position: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    min_count: int = Query(1, ge=1, description="Minimum number of values per player"),
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db)
+):
+    _check_range(start, end)
+    filters = dict(source=source, pitch_type=pitch_type, team=team, position=position, start=start, end=end)
+
+    if stat == "value":
+        rows = leaderboards.top_values(db, metric, limit=limit, **filters)
+        entries = [
+            {
+                **_player_out(row),
+                "value": row[5],
+                "source": row[6],
+                "pitch_type": row[7],
+                "session_id": row[8],
+                "date": datetime.fromisoformat(row[9]),
+                "pitch_no": row[10],
+            }
+            for row in rows
+        ]
+    else:
+        rows = leaderboards.player_stats(db, metric, stat=stat, min_count=min_count, limit=limit, **filters)
+        entries = [
+            {**_player_out(row), "value": round(row[5], 3), "count": row[6]}
+            for row in rows
+        ]
+
+    for entry, rank in zip(entries, leaderboards.ranks([e["value"] for e in entries])):
+        entry["rank"] = rank
+
+    return {
+        "metric": metric,
+        "stat": stat,
+        "period": leaderboards.rollup_period(start, end),
+        "entries": entries,
+    }
+
+
+# -------------------------------
+# Percentile Ranks
+# -------------------------------
+@router.get("/percentiles")
+def get_percentiles(
+    player_id: str,
+    metrics: List[str] = Query(..., alias="metric", description="Repeat for several metrics"),
+    stat: str = Query("max", pattern="^(max|mean)$"),
+    source: Optional[str] = None,
+    pitch_type: Optional[str] = None,
+    team: Optional[str] = None,
+    position: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    min_count: int = Query(1, ge=1),
+    db: Session = Depends(get_db)
+):
+    """Where a player's metrics sit within the org (or a team/position group)."""
+    if not db.query(Player.id).filter(Player.id == player_id).first():
+        raise HTTPException(status_code=404, detail="Player not found")
+    _check_range(start, end)
+
+    filters = dict(source=source, pitch_type=pitch_type, team=team, position=position, start=start, end=end)
+    results = []
+    for metric in metrics:
+        population = leaderboards.player_stats(db, metric, stat=stat, min_count=min_count, **filters)
+        values = [row[5] for row in population]
+        mine = next((row for row in population if row[0] == player_id), None)
+        if mine is None:
+            results.append({"metric": metric, "value": None, "count": 0, "rank": None,
+                            "population": len(values), "percentile": None})
+            continue
+        results.append({
+            "metric": metric,
+            "value": round(mine[5], 3),
+            "count": mine[6],
+            "rank": 1 + sum(1 for v in values if v > mine[5]),
+            "population": len(values),
+            "percentile": leaderboards.percentile_rank(values, mine[5]),
+        })
+
+    return {
+        "player_id": player_id,
+        "stat": stat,
+        "period": leaderboards.rollup_period(start, end),
+        "metrics": results,
+    }
@@ -0,0 +1,107 @@
+"""
+Serves uploaded media: the content-addressed store at /media and the legacy
+upload directories at /uploads and /uploaded_videos.
+
+Responses honour Range (a seek in a long clip transfers only the requested
+bytes, read with a seek, never the whole file), If-Range, and
+If-None-Match / If-Modified-Since (answered with 304). Full-file responses
+go out via the ASGI ``http.response.pathsend`` extension when the server
+offers it, so the server can sendfile() them. Behind nginx, set
+MEDIA_ACCEL_REDIRECT to an internal location and every transfer, ranges
+included, is handed to nginx with X-Accel-Redirect instead.
+"""
+import os
+from email.utils import parsedate
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from app.services import media_store
+
+router = APIRouter(tags=["media"])
+
+# store URL prefix -> (directory, Cache-Control)
+STORES = {
+    "media": (media_store.MEDIA_DIR, media_store.IMMUTABLE_CACHE_CONTROL),
+    # Legacy files can be replaced under the same name: always revalidate
+    "uploads": ("uploads", "no-cache"),
+    "uploaded_videos": ("uploaded_videos", "no-cache"),
+}
+
+# e.g. "/_media" with `location /_media/ { internal; alias /srv/app/; }`
+ACCEL_REDIRECT = os.environ.get("MEDIA_ACCEL_REDIRECT", "").rstrip("/")
+
+
+class MediaResponse(FileResponse):
+    # Larger reads than the 64 KiB default: fewer threadpool round trips per clip
+    chunk_size = 1024 * 1024
+
+
+def _resolve(store: str, name: str):
+    """(path on disk, stat) of `name` inside `store`; 404 for anything outside it or missing."""
+    directory = STORES[store][0]
+    root = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        stat_result = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail="Not found")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Not found")
+    return path, stat_result
+
+
+def _not_modified(request: Request, etag: str, last_modified: str) -> bool:
+    # If-None-Match takes precedence; If-Modified-Since only counts without it (RFC 9110 13.2.2)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    since = parsedate(request.headers.get("if-modified-since") or "")
+    return since is not None and since >= parsedate(last_modified)
+
+
+def serve(request: Request, store: str, name: str) -> Response:
+    path, stat_result = _resolve(store, name)
+    cache_control = STORES[store][1]
+    response = MediaResponse(path, stat_result=stat_result, headers={"Cache-Control": cache_control})
+    sha256 = media_store.blob_key(f"/media/{name}") if store == "media" else None
+    if sha256:
+        # Blob bytes are identified by their hash; the default ETag is mtime-based
+        response.headers["ETag"] = f'"{sha256}"'
+
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers={
+            "ETag": etag, "Last-Modified": last_modified, "Cache-Control": cache_control,
+        })
+
+    if ACCEL_REDIRECT:
+        relative = os.path.relpath(path, os.path.realpath(STORES[store][0])).replace(os.sep, "/")
+        return Response(headers={
+            "X-Accel-Redirect": f"{ACCEL_REDIRECT}/{store}/{relative}",
+            "Content-Type": response.media_type,
+            "ETag": etag, "Last-Modified": last_modified, "Cache-Control": cache_control,
+        })
+    return response
+
+
+# -------------------------------
+# Routes
+# -------------------------------
+@router.api_route("/media/{name:path}", methods=["GET", "HEAD"], include_in_schema=False)
+def get_media(name: str, request: Request):
+    return serve(request, "media", name)
+
+
+@router.api_route("/uploads/{name:path}", methods=["GET", "HEAD"], include_in_schema=False)
+def get_upload(name: str, request: Request):
+    return serve(request, "uploads", name)
+
+
+@router.api_route("/uploaded_videos/{name:path}", methods=["GET", "HEAD"], include_in_schema=False)
+def get_uploaded_video(name: str, request: Request):
+    return serve(request, "uploaded_videos", name)
@@ -6,7 +6,8 @@ from app.db import get_db
 from app.models.player import Player
 from app.models.drill import Drill
 from app.models.player_drill import PlayerDrill
-from app.models.concept import Concept # Add this import at the top
+from app.services import entries
+from app.services import player_summary
 router = APIRouter(prefix="/player-drills", tags=["player-drills"])
 
 
@@ -24,12 +25,8 @@ def add_drill_to_player(
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
 
-    # FIX: Check legacy Drills table first, then check Concepts table
-    drill = db.query(Drill).get(drill_id)
-    if not drill:
-        drill = db.query(Concept).get(drill_id)
-
-    if not drill:
+    # Drills and Concepts share one id space; one lookup tells us which it is
+    if not entries.resolve_type(db, drill_id):
         raise HTTPException(status_code=404, detail="Drill/Concept not found")
 
     # Prevent duplicate assignments
@@ -54,6 +51,7 @@ def add_drill_to_player(
     )
 
     db.add(new_pd)
+    player_summary.refresh(db, player_id)
     db.commit()
     db.refresh(new_pd)
 
@@ -83,6 +81,7 @@ def remove_drill_from_player(
         raise HTTPException(status_code=404, detail="Drill assignment not found")
 
     db.delete(pd)
+    player_summary.refresh(db, player_id)
     db.commit()
 
     return {"message": "Drill removed successfully"}
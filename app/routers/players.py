@@ -1,65 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import tuple_, and_, or_, func, literal_column
+from sqlalchemy.orm import Session, selectinload
+from datetime import datetime, date
+from typing import List, Optional
 
 from app.db import get_db
 from app.models.player import Player
 from app.models.player_history import PlayerHistory
-from app.models.drill import Drill
 from app.models.player_drill import PlayerDrill
 # Import Session model to look up metadata
-from app.models.session import Session as BaseballSession
+from app.models.session import Session as BaseballSession, SessionMetric, SessionMedia
 from app.schemas.player import PlayerCreate, PlayerRead, PlayerUpdate
-from app.models.concept import Concept
+from app.services import entries
+from app.services import player_summary
+from app.services import metric_trends
+from app.services import media_store
+from app.services import metric_rollups
+from app.services import pitch_arsenal
+from app.services import response_cache
+from app.services.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/players", tags=["players"])
 
 
 # -------------------------------
-# Helper: Attach Drills to Player
+# Helper: Attach Drills to Players
 # -------------------------------
-def _attach_drills(player: Player, db: Session):
+def _attach_drills_bulk(players: List[Player], db: Session):
     """
-    Helper function to fetch drill associations and session context,
-    attaching them to the player object for the Pydantic response.
+    Fetch drill associations and session context for a whole page of
+    players and attach them for the Pydantic response.
+
+    Uses a fixed number of queries however many players or assignments
+    there are: assignments, drill/concept titles, session origins.
     """
+    if not players:
+        return players
+
+    player_ids = [p.id for p in players]
     player_drills = (
         db.query(PlayerDrill)
-        .filter(PlayerDrill.player_id == player.id)
+        .filter(PlayerDrill.player_id.in_(player_ids))
         .all()
     )
 
-    drills_with_info = []
+    # Drill or Concept titles for every assigned id in one query
+    titles = entries.load_titles(db, [pd.drill_id for pd in player_drills])
+
+    session_ids = {pd.session_id for pd in player_drills if pd.session_id}
+    sessions = {}
+    if session_ids:
+        sessions = {
+            s.id: s
+            for s in db.query(BaseballSession.id, BaseballSession.session_type, BaseballSession.date)
+            .filter(BaseballSession.id.in_(session_ids))
+        }
+
+    drills_by_player = {pid: [] for pid in player_ids}
     for pd in player_drills:
-        # 2. CHECK BOTH TABLES: Try legacy Drill first, then Concept fallback
-        drill = db.query(Drill).get(pd.drill_id)
-        if not drill:
-            drill = db.query(Concept).get(pd.drill_id)
-
-        if drill:
-            session_origin = None
-            # Handle the session link if it exists on the bridge table
-            if hasattr(pd, "session_id") and pd.session_id:
-                sess = db.query(BaseballSession).get(pd.session_id)
-                if sess:
-                    session_origin = {
-                        "type": sess.session_type,
-                        "date": sess.date.isoformat() if sess.date else None
-                    }
-
-            drills_with_info.append(
-                {
-                    "id": pd.drill_id,
-                    "title": drill.title,
-                    "assigned_date": pd.date_performed,
-                    "session_origin": session_origin
-                }
-            )
-
-    # Attach to the object before it hits the Pydantic response model
-    setattr(player, "drills", drills_with_info)
-    return player
+        if pd.drill_id not in titles:
+            continue
+
+        session_origin = None
+        sess = sessions.get(pd.session_id)
+        if sess:
+            session_origin = {
+                "type": sess.session_type,
+                "date": sess.date.isoformat() if sess.date else None
+            }
+
+        drills_by_player[pd.player_id].append(
+            {
+                "id": pd.drill_id,
+                "title": titles[pd.drill_id][1],
+                "assigned_date": pd.date_performed,
+                "session_origin": session_origin
+            }
+        )
+
+    # Attach to the objects before they hit the Pydantic response model
+    for player in players:
+        setattr(player, "drills", drills_by_player[player.id])
+    return players
+
+
+def _attach_drills(player: Player, db: Session):
+    return _attach_drills_bulk([player], db)[0]
 
 
 # -------------------------------
@@ -94,6 +120,7 @@ def create_player(player: PlayerCreate, db: Session = Depends(get_db)):
         )
         db.add(db_history)
 
+    player_summary.refresh(db, db_player.id)
     db.commit()
     db.refresh(db_player)
     return _attach_drills(db_player, db)
@@ -102,12 +129,96 @@ def create_player(player: PlayerCreate, db: Session = Depends(get_db)):
 # -------------------------------
 # List Players
 # -------------------------------
+# Sort keys: (expression, value getter) pairs, id is always appended as the tie-breaker.
+# Each list matches one of the ix_players_*_sort indexes expression for expression;
+# '' is a literal (not a bound parameter) so SQLite can match coalesce() to its index.
+_LAST = (Player.last_name.collate("NOCASE"), lambda p: p.last_name)
+_FIRST = (Player.first_name.collate("NOCASE"), lambda p: p.first_name)
+_BLANK = literal_column("''")
+ROSTER_SORTS = {
+    "name": [_LAST, _FIRST],
+    "first_name": [_FIRST, _LAST],
+    "team": [(func.coalesce(Player.team, _BLANK), lambda p: p.team or ""), _LAST, _FIRST],
+    "position": [(func.coalesce(Player.position, _BLANK), lambda p: p.position or ""), _LAST, _FIRST],
+    "dob": [(func.coalesce(Player.dob, _BLANK), lambda p: str(p.dob or "")), _LAST, _FIRST],
+}
+
+
+def _name_prefix(column, prefix: str):
+    # Range scan instead of LIKE so the NOCASE name indexes are used
+    col = column.collate("NOCASE")
+    return and_(col >= prefix, col < prefix + "\U0010ffff")
+
+
+def _years_ago(years: int) -> str:
+    today = date.today()
+    try:
+        return today.replace(year=today.year - years).isoformat()
+    except ValueError:  # Feb 29
+        return today.replace(year=today.year - years, day=28).isoformat()
+
+
 @router.get("/", response_model=List[PlayerRead])
-def list_players(db: Session = Depends(get_db)):
-    players = db.query(Player).all()
-    for p in players:
-        _attach_drills(p, db)
-    return players
+def list_players(
+        response: Response,
+        q: Optional[str] = Query(None, description="Name prefix; every word must start the first or last name"),
+        team: Optional[str] = Query(None),
+        position: Optional[str] = Query(None),
+        bats: Optional[str] = Query(None, pattern="^[RLS]$"),
+        throws: Optional[str] = Query(None, pattern="^[RL]$"),
+        min_age: Optional[int] = Query(None, ge=0),
+        max_age: Optional[int] = Query(None, ge=0),
+        sort: str = Query("name", pattern="^(name|first_name|team|position|dob)$"),
+        order: str = Query("asc", pattern="^(asc|desc)$"),
+        limit: Optional[int] = Query(None, ge=1, le=500, description="Page size (omit for the full roster)"),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+        db: Session = Depends(get_db),
+):
+    """
+    Search, filter and sort the roster. Pages are keyset-based (see
+    X-Next-Cursor); a cursor is only valid with the same filters and sort.
+    History and drill assignments for the whole page are batch-loaded, so
+    the query count does not depend on the page size.
+    """
+    query = db.query(Player).options(selectinload(Player.history), selectinload(Player.summary))
+
+    for word in (q or "").split():
+        query = query.filter(or_(_name_prefix(Player.last_name, word), _name_prefix(Player.first_name, word)))
+    if team:
+        query = query.filter(Player.team == team)
+    if position:
+        query = query.filter(Player.position == position)
+    if bats:
+        query = query.filter(Player.bats == bats)
+    if throws:
+        query = query.filter(Player.throws == throws)
+    # dob is stored as an ISO date string, so age bounds are string ranges
+    if min_age is not None:
+        query = query.filter(Player.dob <= _years_ago(min_age))
+    if max_age is not None:
+        query = query.filter(Player.dob > _years_ago(max_age + 1))
+
+    keys = ROSTER_SORTS[sort] + [(Player.id, lambda p: p.id)]
+    exprs = [expr for expr, _ in keys]
+    if cursor:
+        values = decode_cursor(cursor, len(keys))
+        after = tuple_(*values)
+        # The bound on the first key alone lets SQLite seek the index; the row value alone only filters
+        if order == "asc":
+            query = query.filter(exprs[0] >= values[0], tuple_(*exprs) > after)
+        else:
+            query = query.filter(exprs[0] <= values[0], tuple_(*exprs) < after)
+    query = query.order_by(*(e.asc() if order == "asc" else e.desc() for e in exprs))
+    if limit:
+        query = query.limit(limit + 1)
+
+    players = query.all()
+    if limit and len(players) > limit:
+        players = players[:limit]
+        tail = players[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(*(getter(tail) for _, getter in keys))
+
+    return _attach_drills_bulk(players, db)
 
 
 # -------------------------------
@@ -122,6 +233,94 @@ def get_player(player_id: str, db: Session = Depends(get_db)):
     return _attach_drills(player, db)
 
 
+# -------------------------------
+# Metric Trends
+# -------------------------------
+@router.get("/{player_id}/metrics/trends")
+def get_metric_trends(
+    player_id: str,
+    metric: str = Query(..., description="Metric name, e.g. Velocity"),
+    pitch_type: Optional[str] = None,
+    source: Optional[str] = None,
+    window: int = Query(90, ge=1, le=3650, description="Look-back in days"),
+    bucket: str = Query("week", pattern="^(day|week|month)$"),
+    rolling: int = Query(1, ge=1, le=52, description="Buckets per rolling window"),
+    db: Session = Depends(get_db)
+):
+    if not db.query(Player.id).filter(Player.id == player_id).first():
+        raise HTTPException(status_code=404, detail="Player not found")
+
+    return {
+        "player_id": player_id,
+        "metric": metric,
+        "pitch_type": pitch_type,
+        "source": source,
+        "window": window,
+        "bucket": bucket,
+        "rolling": rolling,
+        "buckets": metric_trends.trends(
+            db, player_id, metric, window_days=window, bucket=bucket,
+            pitch_type=pitch_type, source=source, rolling=rolling
+        ),
+    }
+
+
+# -------------------------------
+# Metric Rollups
+# -------------------------------
+@router.get("/{player_id}/metrics/rollups")
+def get_metric_rollups(
+    player_id: str,
+    period: str = Query("all", pattern=r"^(all|\d{4}(-\d{2}(-\d{2})?)?)$",
+                        description="all, YYYY, YYYY-MM or YYYY-MM-DD"),
+    source: Optional[str] = None,
+    pitch_type: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    if not db.query(Player.id).filter(Player.id == player_id).first():
+        raise HTTPException(status_code=404, detail="Player not found")
+
+    return {
+        "player_id": player_id,
+        "period": period,
+        "cells": metric_rollups.read(db, player_id, period, source=source, pitch_type=pitch_type),
+    }
+
+
+# -------------------------------
+# Pitch Arsenal
+# -------------------------------
+@router.get("/{player_id}/arsenal")
+def get_pitch_arsenal(
+    player_id: str,
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    source: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Per-pitch-type movement centroids and ellipses, release consistency and
+    pairwise separation from the player's imported pitches. Cached until the
+    player's sessions change.
+    """
+    if not db.query(Player.id).filter(Player.id == player_id).first():
+        raise HTTPException(status_code=404, detail="Player not found")
+
+    def build():
+        return {
+            "player_id": player_id,
+            "start": start,
+            "end": end,
+            "source": source,
+            **pitch_arsenal.analyze(db, player_id, start=start, end=end, source=source),
+        }, {}
+
+    return response_cache.cached_json_response(
+        request, db, build, namespace=pitch_arsenal.cache_namespace(player_id)
+    )
+
+
 # -------------------------------
 # Update Player (Edit Profile & Notes)
 # -------------------------------
@@ -137,6 +336,7 @@ def update_player(player_id: str, player_data: PlayerUpdate, db: Session = Depen
     for key, value in update_data.items():
         setattr(db_player, key, value)
 
+    player_summary.refresh(db, db_player.id)
     db.commit()
     db.refresh(db_player)
 
@@ -161,7 +361,13 @@ def delete_player(player_id: str, db: Session = Depends(get_db)):
         # 1. Delete associated data to prevent foreign key errors
         db.query(PlayerHistory).filter(PlayerHistory.player_id == player_id).delete()
         db.query(PlayerDrill).filter(PlayerDrill.player_id == player_id).delete()
+        session_ids = db.query(BaseballSession.id).filter(BaseballSession.player_id == player_id)
+        media_store.drop_refs(db, media_store.SESSION, [sid for sid, in session_ids])
+        db.query(SessionMetric).filter(SessionMetric.session_id.in_(session_ids)).delete(synchronize_session=False)
+        db.query(SessionMedia).filter(SessionMedia.session_id.in_(session_ids)).delete(synchronize_session=False)
         db.query(BaseballSession).filter(BaseballSession.player_id == player_id).delete()
+        metric_rollups.remove_player(db, player_id)
+        pitch_arsenal.invalidate(db, player_id)
 
         # 2. Delete the player
         db.delete(db_player)
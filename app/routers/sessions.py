@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, UploadFile, File, Form, Query, Response
+from sqlalchemy import bindparam, delete, func, insert, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, date, time, timedelta
 from collections import defaultdict
-from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
 
+from app.models.metric_definition import MetricDefinition
 from app.models.session import Session, SessionMetric, SessionMedia
 from app.models.player_drill import PlayerDrill
 from app.models.drill import Drill
 from app.db import SessionLocal
+from app.services import (
+    media_derivatives, media_store, metric_dictionary, metric_rollups, pitch_arsenal, player_summary,
+    session_compare, session_import
+)
+from app.services.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
@@ -35,101 +43,377 @@ def parse_date(date_str):
             detail="Invalid date format. Use YYYY-MM-DD."
         )
 
-def flatten_metrics(metrics_payload, session_id, db: Session):
-    for group in metrics_payload:
-        source = group.get("source")
-        pitch_type = group.get("pitch_type")
-        for metric in group.get("metrics", []):
-            db.add(SessionMetric(
-                session_id=session_id,
-                source=source,
-                pitch_type=pitch_type,
-                metric_name=metric["metric_name"],
-                metric_value=str(metric["metric_value"]),
-                unit=metric.get("unit")
-            ))
-
-def serialize_session(session: Session):
+def collect_metrics(metrics_payloads, db: Session):
+    """
+    Resolve the metric groups of several sessions in one go. Returns, per
+    payload, {(metric_id, pitch_type): (value, value_text)}. A metric sent
+    twice for the same pitch type of one session is rejected with 400, on
+    create and update alike.
+    """
+    rows = [
+        (i, group.get("source"), group.get("pitch_type"), metric)
+        for i, metrics_payload in enumerate(metrics_payloads)
+        for group in metrics_payload
+        for metric in group.get("metrics", [])
+    ]
+    keys = [metric_dictionary.make_key(source, m["metric_name"], m.get("unit")) for _, source, _, m in rows]
+    metric_ids = metric_dictionary.resolve(db, keys)
+    collected = [{} for _ in metrics_payloads]
+    for key, (i, source, pitch_type, metric) in zip(keys, rows):
+        row_key = (metric_ids[key], pitch_type)
+        if row_key in collected[i]:
+            where = f"Session {i}: " if len(metrics_payloads) > 1 else ""
+            raise HTTPException(
+                status_code=400,
+                detail=f"{where}Duplicate metric '{metric['metric_name']}' ({source}, pitch type {pitch_type or 'none'})"
+            )
+        collected[i][row_key] = metric_dictionary.split_value(metric["metric_value"])
+    return collected
+
+def diff_metrics(metrics_payload, session_id, db: Session):
+    """
+    Compare a metrics payload with the session's stored (non-pitch) rows.
+    Returns (inserts, updates, deletes): rows to add, {id, value} changes,
+    and ids to drop. Unchanged rows keep their id and are not touched.
+    """
+    incoming, = collect_metrics([metrics_payload], db)
+
+    inserts, updates, deletes = [], [], []
+    kept = set()
+    for row_id, metric_id, pitch_type, value, value_text in (
+        db.query(SessionMetric.id, SessionMetric.metric_id, SessionMetric.pitch_type,
+                 SessionMetric.value, SessionMetric.value_text)
+        .filter(SessionMetric.session_id == session_id, SessionMetric.pitch_no.is_(None))
+        .order_by(SessionMetric.id)
+    ):
+        key = (metric_id, pitch_type)
+        if key not in incoming or key in kept:
+            deletes.append(row_id)
+            continue
+        kept.add(key)
+        if (value, value_text) != incoming[key]:
+            new_value, new_text = incoming[key]
+            updates.append({"row_id": row_id, "value": new_value, "value_text": new_text})
+
+    for (metric_id, pitch_type), (value, value_text) in incoming.items():
+        if (metric_id, pitch_type) not in kept:
+            inserts.append({
+                "session_id": session_id,
+                "metric_id": metric_id,
+                "pitch_type": pitch_type,
+                "pitch_no": None,
+                "value": value,
+                "value_text": value_text
+            })
+    return inserts, updates, deletes
+
+def apply_metric_changes(session: Session, changes, db: Session):
+    inserts, updates, deletes = changes
+    table = SessionMetric.__table__
+    if deletes:
+        db.execute(delete(table).where(table.c.id.in_(deletes)))
+    if updates:
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(value=bindparam("value"), value_text=bindparam("value_text")),
+            updates
+        )
+    if inserts:
+        db.execute(insert(table), inserts)
+    if any(changes):
+        db.expire(session, ["metrics"])
+
+def media_out(media: SessionMedia, variants: dict = None):
+    return {
+        "id": media.id,
+        "session_id": media.session_id,
+        "file_url": media.file_url,
+        "media_type": media.media_type,
+        # Resized image / poster URLs keyed by variant (thumb, medium, poster)
+        "variants": (variants or {}).get(media.file_url, {})
+    }
+
+def group_metrics(rows):
+    """(source, pitch_type, metric_name, metric_value, unit) rows -> API metric groups."""
     grouped = defaultdict(list)
-    for m in session.metrics:
-        key = (m.source, m.pitch_type)
-        grouped[key].append({
-            "metric_name": m.metric_name,
-            "metric_value": m.metric_value,
-            "unit": m.unit
+    for source, pitch_type, metric_name, metric_value, unit in rows:
+        grouped[(source, pitch_type)].append({
+            "metric_name": metric_name,
+            "metric_value": metric_value,
+            "unit": unit
         })
+    return [
+        {
+            "source": source,
+            "pitch_type": pitch_type,
+            "metrics": metrics
+        }
+        for (source, pitch_type), metrics in grouped.items()
+    ]
+
+def session_header(session: Session):
     return {
         "id": session.id,
         "player_id": session.player_id,
         "date": session.date,
         "session_type": session.session_type,
-        "notes": session.notes,
-        "metrics": [
+        "notes": session.notes
+    }
+
+def serialize_session(session: Session, db: Session):
+    variants = media_derivatives.variants_for(db, [m.file_url for m in session.media])
+    return {
+        **session_header(session),
+        "metrics": group_metrics(
+            (m.source, m.pitch_type, m.metric_name, m.metric_value, m.unit)
+            for m in session.metrics
+        ),
+        "media": [media_out(m, variants) for m in session.media]
+    }
+
+def serialize_sessions(sessions, db: Session, summary: bool = False):
+    """
+    Serialize a page of sessions with a fixed number of queries: one for
+    the metrics (or, in summary mode, the pitch types) and one for media.
+    """
+    ids = [s.id for s in sessions]
+    if not ids:
+        return []
+
+    if summary:
+        pitch_types = defaultdict(list)
+        for session_id, pitch_type in (
+            db.query(SessionMetric.session_id, SessionMetric.pitch_type)
+            .filter(SessionMetric.session_id.in_(ids), SessionMetric.pitch_no.is_(None))
+            .distinct()
+            .order_by(SessionMetric.session_id, SessionMetric.pitch_type)
+        ):
+            if pitch_type:
+                pitch_types[session_id].append(pitch_type)
+        media_counts = dict(
+            db.query(SessionMedia.session_id, func.count())
+            .filter(SessionMedia.session_id.in_(ids))
+            .group_by(SessionMedia.session_id)
+        )
+        return [
             {
-                "source": source,
-                "pitch_type": pitch_type,
-                "metrics": metrics
+                **session_header(s),
+                "pitch_types": pitch_types.get(s.id, []),
+                "media_count": media_counts.get(s.id, 0)
             }
-            for (source, pitch_type), metrics in grouped.items()
-        ],
-        "media": session.media
-    }
+            for s in sessions
+        ]
+
+    metrics = defaultdict(list)
+    for session_id, pitch_type, value, value_text, source, name, unit in (
+        db.query(
+            SessionMetric.session_id, SessionMetric.pitch_type, SessionMetric.value, SessionMetric.value_text,
+            MetricDefinition.source, MetricDefinition.name, MetricDefinition.unit
+        )
+        .join(MetricDefinition, MetricDefinition.id == SessionMetric.metric_id)
+        .filter(SessionMetric.session_id.in_(ids), SessionMetric.pitch_no.is_(None))
+        .order_by(SessionMetric.session_id, SessionMetric.id)
+    ):
+        metrics[session_id].append(
+            (source, pitch_type, name, SessionMetric.format_value(value, value_text), unit or None)
+        )
+
+    media_rows = db.query(SessionMedia).filter(SessionMedia.session_id.in_(ids)).order_by(SessionMedia.id).all()
+    variants = media_derivatives.variants_for(db, [m.file_url for m in media_rows])
+    media = defaultdict(list)
+    for m in media_rows:
+        media[m.session_id].append(media_out(m, variants))
+
+    return [
+        {
+            **session_header(s),
+            "metrics": group_metrics(metrics.get(s.id, [])),
+            "media": media.get(s.id, [])
+        }
+        for s in sessions
+    ]
 
 # -------------------------------
 # Create Session
 # -------------------------------
-@router.post("/")
-def create_session(session_data: dict, db: Session = Depends(get_db)):
-    # Create session
-    new_session = Session(
-        player_id=session_data["player_id"],
-        date=parse_date(session_data.get("date")),
-        session_type=session_data["session_type"],
-        notes=session_data.get("notes")
-    )
-    db.add(new_session)
-    db.commit()
-    db.refresh(new_session)
+MAX_BULK_SESSIONS = 1000
+
+def assign_drills(db: Session, assignments):
+    """
+    Insert (player_id, drill_id, date_performed, session_id) assignments;
+    drills the player already has are left as they are.
+    """
+    rows = [
+        {"player_id": player_id, "drill_id": drill_id, "date_performed": performed, "session_id": session_id}
+        for player_id, drill_id, performed, session_id in assignments
+    ]
+    if rows:
+        db.execute(sqlite_insert(PlayerDrill).on_conflict_do_nothing(), rows)
 
-    # Add metrics
-    flatten_metrics(session_data.get("metrics", []), new_session.id, db)
+def create_sessions(payloads, db: Session):
+    """
+    Create many sessions with their metrics, media and drill assignments in
+    the caller's transaction: the sessions go in as one batch, then one
+    executemany each for metrics, media and drills. Does not commit.
+    """
+    for i, data in enumerate(payloads):
+        missing = [field for field in ("player_id", "session_type") if not data.get(field)]
+        if missing:
+            where = f"Session {i}: " if len(payloads) > 1 else ""
+            raise HTTPException(status_code=400, detail=f"{where}missing {', '.join(missing)}")
+    incoming = collect_metrics([data.get("metrics") or [] for data in payloads], db)
+
+    sessions = [
+        Session(
+            player_id=data["player_id"],
+            date=parse_date(data.get("date")),
+            session_type=data["session_type"],
+            notes=data.get("notes")
+        )
+        for data in payloads
+    ]
+    db.add_all(sessions)
+    db.flush()
 
-    # Add media
-    for media in session_data.get("media", []):
-        db.add(SessionMedia(
-            session_id=new_session.id,
-            file_url=media["file_url"],
-            media_type=media.get("media_type")
-        ))
+    metric_rows = [
+        {
+            "session_id": session.id,
+            "metric_id": metric_id,
+            "pitch_type": pitch_type,
+            "pitch_no": None,
+            "value": value,
+            "value_text": value_text
+        }
+        for session, metrics in zip(sessions, incoming)
+        for (metric_id, pitch_type), (value, value_text) in metrics.items()
+    ]
+    if metric_rows:
+        db.execute(insert(SessionMetric.__table__), metric_rows)
+
+    media_rows = [
+        {"session_id": session.id, "file_url": media["file_url"], "media_type": media.get("media_type")}
+        for session, data in zip(sessions, payloads)
+        for media in data.get("media", [])
+    ]
+    if media_rows:
+        db.execute(insert(SessionMedia.__table__), media_rows)
+        media_urls = defaultdict(list)
+        for row in media_rows:
+            media_urls[row["session_id"]].append(row["file_url"])
+        media_store.set_refs(db, media_store.SESSION, media_urls)
 
     # Assign drills to player with session date
-    drill_ids = session_data.get("drill_ids", [])
-    for drill_id in drill_ids:
-        try:
-            db.add(PlayerDrill(
-                player_id=session_data["player_id"],
-                drill_id=drill_id,
-                date_performed=new_session.date  # <-- save session date
-            ))
-        except IntegrityError:
-            db.rollback()  # ignore if drill already assigned
+    assign_drills(db, [
+        (session.player_id, drill_id, session.date, session.id)
+        for session, data in zip(sessions, payloads)
+        for drill_id in data.get("drill_ids", [])
+    ])
+
+    metric_rollups.add_sessions(db, sessions)
+    for player_id in {session.player_id for session in sessions}:
+        player_summary.refresh(db, player_id)
+        pitch_arsenal.invalidate(db, player_id)
+    return sessions
+
+@router.post("/")
+def create_session(session_data: dict, db: Session = Depends(get_db)):
+    new_session, = create_sessions([session_data], db)
     db.commit()
 
     db.refresh(new_session)
-    return serialize_session(new_session)
+    return serialize_session(new_session, db)
+
+@router.post("/bulk")
+def create_sessions_bulk(payload: List[dict] = Body(...), db: Session = Depends(get_db)):
+    """Create many sessions (e.g. a season of bullpens) in one transaction."""
+    if len(payload) > MAX_BULK_SESSIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_SESSIONS} sessions per request")
+    sessions = create_sessions(payload, db)
+    db.commit()
+    return {"created": len(sessions), "ids": [s.id for s in sessions]}
 
 # -------------------------------
 # Get Sessions for Player
 # -------------------------------
 @router.get("/player/{player_id}")
-def get_sessions_for_player(player_id: str, db: Session = Depends(get_db)):
-    sessions = (
-        db.query(Session)
-        .filter(Session.player_id == player_id)
-        .order_by(Session.date.desc())
-        .all()
-    )
-    return [serialize_session(s) for s in sessions]
+def get_sessions_for_player(
+    player_id: str,
+    response: Response,
+    start: Optional[date] = Query(None, description="Only sessions on or after this date"),
+    end: Optional[date] = Query(None, description="Only sessions on or before this date"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Page size (omit for every session)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    summary: bool = Query(False, description="Leave out per-metric detail"),
+    db: Session = Depends(get_db)
+):
+    """
+    A player's sessions, newest first. Pages are keyset-based on
+    (date, id); see X-Next-Cursor.
+    """
+    query = db.query(Session).filter(Session.player_id == player_id)
+    if start:
+        query = query.filter(Session.date >= datetime.combine(start, time.min))
+    if end:
+        query = query.filter(Session.date < datetime.combine(end + timedelta(days=1), time.min))
+    if cursor:
+        after_date, after_id = decode_cursor(cursor, 2)
+        try:
+            after_date = datetime.fromisoformat(after_date)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(Session.date, Session.id) < tuple_(after_date, after_id))
+    query = query.order_by(Session.date.desc(), Session.id.desc())
+    if limit:
+        query = query.limit(limit + 1)
+
+    sessions = query.all()
+    if limit and len(sessions) > limit:
+        sessions = sessions[:limit]
+        tail = sessions[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(tail.date.isoformat(), tail.id)
+
+    return serialize_sessions(sessions, db, summary=summary)
+
+# -------------------------------
+# Compare Sessions
+# -------------------------------
+@router.get("/compare")
+def compare_sessions(
+    a: int = Query(..., description="Session under review"),
+    b: Optional[int] = Query(None, description="Session to compare against"),
+    baseline: Optional[str] = Query(None, pattern=r"^last_\d+$",
+                                    description="Compare against the mean of the player's last N sessions, e.g. last_5"),
+    db: Session = Depends(get_db)
+):
+    """
+    Aligned metric table for session `a` against session `b` or a baseline:
+    values, delta (a - b), percent change and z-scores of both sides
+    against the player's earlier sessions.
+    """
+    if (b is None) == (baseline is None):
+        raise HTTPException(status_code=400, detail="Pass exactly one of b or baseline")
+
+    session_a = db.query(Session).filter(Session.id == a).first()
+    if not session_a:
+        raise HTTPException(status_code=404, detail="Session not found")
+    session_b, baseline_n = None, None
+    if b is not None:
+        session_b = db.query(Session).filter(Session.id == b).first()
+        if not session_b:
+            raise HTTPException(status_code=404, detail="Session not found")
+    else:
+        baseline_n = int(baseline.split("_", 1)[1])
+        if not 1 <= baseline_n <= 100:
+            raise HTTPException(status_code=400, detail="baseline must be between last_1 and last_100")
+
+    result = session_compare.compare(db, session_a, session_b, baseline_n=baseline_n)
+    return {
+        "a": session_header(session_a),
+        "b": session_header(session_b) if session_b else None,
+        "baseline": baseline,
+        **result
+    }
 
 # -------------------------------
 # Get Single Session
@@ -139,38 +423,77 @@ def get_session(session_id: int, db: Session = Depends(get_db)):
     session = db.query(Session).filter(Session.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    return serialize_session(session)
+    return serialize_session(session, db)
 
 # -------------------------------
 # Update Session
 # -------------------------------
-@router.put("/{session_id}")
-def update_session(session_id: int, session_data: dict, db: Session = Depends(get_db)):
+def _update_session(session_id: int, session_data: dict, db: Session, partial: bool):
     session = db.query(Session).filter(Session.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    if "date" in session_data:
-        session.date = parse_date(session_data["date"])
-    session.session_type = session_data.get("session_type", session.session_type)
-    session.notes = session_data.get("notes", session.notes)
+    new_date = parse_date(session_data["date"]) if "date" in session_data else session.date
 
-    # Remove old metrics
-    db.query(SessionMetric).filter(SessionMetric.session_id == session_id).delete()
+    # PUT replaces the metric set (missing = none); PATCH leaves it alone unless sent
+    changes = ([], [], [])
+    if "metrics" in session_data or not partial:
+        changes = diff_metrics(session_data.get("metrics") or [], session_id, db)
 
-    # Insert new metrics
-    flatten_metrics(session_data.get("metrics", []), session_id, db)
+    # Rollups only need touching when values or the session date move
+    touch_rollups = any(changes) or new_date != session.date
+    if touch_rollups:
+        metric_rollups.remove_session(db, session)
+
+    session.date = new_date
+    session.session_type = session_data.get("session_type", session.session_type)
+    session.notes = session_data.get("notes", session.notes)
+    apply_metric_changes(session, changes, db)
 
     # Optionally update assigned drills
-    drill_ids = session_data.get("drill_ids", [])
-    for drill_id in drill_ids:
-        try:
-            db.add(PlayerDrill(player_id=session.player_id, drill_id=drill_id))
-        except IntegrityError:
-            db.rollback()
+    assign_drills(db, [
+        (session.player_id, drill_id, None, None) for drill_id in session_data.get("drill_ids", [])
+    ])
+    if touch_rollups:
+        metric_rollups.add_session(db, session)
+        pitch_arsenal.invalidate(db, session.player_id)
+    player_summary.refresh(db, session.player_id)
     db.commit()
     db.refresh(session)
-    return serialize_session(session)
+    return serialize_session(session, db)
+
+@router.put("/{session_id}")
+def update_session(session_id: int, session_data: dict, db: Session = Depends(get_db)):
+    return _update_session(session_id, session_data, db, partial=False)
+
+@router.patch("/{session_id}")
+def patch_session(session_id: int, session_data: dict, db: Session = Depends(get_db)):
+    return _update_session(session_id, session_data, db, partial=True)
+
+# -------------------------------
+# Import Raw Export (Rapsodo / TrackMan)
+# -------------------------------
+@router.post("/{session_id}/import")
+def import_session_file(
+    session_id: int,
+    file: UploadFile = File(...),
+    source: str = Form("rapsodo"),
+    replace: bool = Form(True),
+    column_map: str = Form(None),
+    db: Session = Depends(get_db)
+):
+    session = db.query(Session).filter(Session.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    metric_rollups.remove_session(db, session)
+    result = session_import.import_csv(
+        db, session_id, source, file.file, column_map=column_map, replace=replace
+    )
+    metric_rollups.add_session(db, session)
+    pitch_arsenal.invalidate(db, session.player_id)
+    db.commit()
+    return {"session_id": session_id, **result}
 
 # -------------------------------
 # Delete Session
@@ -180,6 +503,14 @@ def delete_session(session_id: int, db: Session = Depends(get_db)):
     session = db.query(Session).filter(Session.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+    metric_rollups.remove_session(db, session)
+    db.query(SessionMetric).filter(
+        SessionMetric.session_id == session_id,
+        SessionMetric.pitch_no.isnot(None)
+    ).delete(synchronize_session=False)
     db.delete(session)
+    media_store.drop_refs(db, media_store.SESSION, [session_id])
+    player_summary.refresh(db, session.player_id)
+    pitch_arsenal.invalidate(db, session.player_id)
     db.commit()
     return {"detail": "Session deleted"}
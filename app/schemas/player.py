@@ -1,5 +1,6 @@
 
 from datetime import date, datetime # Added datetime for precise assignment timestamps
+import datetime as dt
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 # -----------------------
@@ -21,7 +22,7 @@ class DrillRead(BaseModel):
 class PlayerHistoryBase(BaseModel):
     change_type: str  # e.g., "Position Change", "Mechanical Adjustment"
     notes: Optional[str] = None
-    date: Optional[date] = None
+    date: Optional[dt.date] = None  # the field name shadows `date` inside the class
 
 
 class PlayerHistoryCreate(PlayerHistoryBase):
@@ -70,6 +71,16 @@ class PlayerUpdate(BaseModel):
     notes: Optional[str] = None
     notes_updated_at: Optional[datetime] = None
 
+class PlayerSummaryRead(BaseModel):
+    drill_count: int = 0
+    session_count: int = 0
+    last_session_date: Optional[datetime] = None
+    session_type_counts: Dict[str, int] = {}
+    notes_updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 class PlayerRead(BaseModel):
     id: str
     first_name: str
@@ -88,6 +99,7 @@ class PlayerRead(BaseModel):
     notes_updated_at: Optional[datetime] = None
     history: List[PlayerHistoryRead] = []
     drills: List[DrillRead] = []
+    summary: Optional[PlayerSummaryRead] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,196 @@
+# app/services/concept_graph.py
+"""
+Traversal helpers for the concept relation graph.
+
+An edge in ``concept_relations`` reads "from_concept <relation_type>
+to_concept" and points at the concept being referred to:
+
+    (A -> B, "prerequisite")  B is a prerequisite of A
+    (A -> B, "builds_on")     A builds on B
+
+For those two "ordering" types B must be learned before A, which is what
+``curriculum_order`` uses. "related" and "counterpoint" edges are only
+walked, never ordered.
+"""
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+RELATION_TYPES = ("related", "prerequisite", "counterpoint", "builds_on")
+ORDERING_TYPES = ("prerequisite", "builds_on")
+
+Edge = Tuple[str, str, str]  # (from_id, to_id, relation_type)
+
+
+def _in_clause(prefix: str, values: Sequence[str]):
+    params = {f"{prefix}{i}": v for i, v in enumerate(values)}
+    return ", ".join(f":{k}" for k in params), params
+
+
+def walk(db: Session, root_id: str, depth: int, types: Sequence[str],
+         direction: str = "out") -> Dict[str, int]:
+    """
+    Breadth-first walk from `root_id` with one recursive CTE.
+    Returns {concept_id: distance} for every concept within `depth` hops.
+
+    direction: "out" follows from -> to (what the root depends on),
+               "in" follows to -> from (what depends on the root),
+               "both" ignores edge direction (neighbourhood).
+    """
+    type_list, params = _in_clause("type_", types)
+    params.update({"root": root_id, "depth": depth})
+
+    steps = []
+    if direction in ("out", "both"):
+        steps.append(f"""
+            SELECT r.to_concept_id, w.depth + 1
+            FROM concept_relations r JOIN walk w ON r.from_concept_id = w.concept_id
+            WHERE w.depth < :depth AND r.relation_type IN ({type_list})
+        """)
+    if direction in ("in", "both"):
+        steps.append(f"""
+            SELECT r.from_concept_id, w.depth + 1
+            FROM concept_relations r JOIN walk w ON r.to_concept_id = w.concept_id
+            WHERE w.depth < :depth AND r.relation_type IN ({type_list})
+        """)
+
+    # UNION (not UNION ALL) drops repeated (concept, depth) rows, so cycles
+    # cannot make the walk grow beyond nodes * depth rows.
+    sql = f"""
+        WITH RECURSIVE walk(concept_id, depth) AS (
+            SELECT :root, 0
+            UNION
+            {" UNION ".join(steps)}
+        )
+        SELECT concept_id, MIN(depth) FROM walk GROUP BY concept_id
+    """
+    return {concept_id: dist for concept_id, dist in db.execute(text(sql), params)}
+
+
+def edges_between(db: Session, concept_ids: Sequence[str], types: Sequence[str]) -> List[Edge]:
+    """All edges of the given types whose both ends are in `concept_ids`."""
+    if not concept_ids:
+        return []
+    id_list, params = _in_clause("id_", concept_ids)
+    type_list, type_params = _in_clause("type_", types)
+    params.update(type_params)
+    rows = db.execute(text(f"""
+        SELECT from_concept_id, to_concept_id, relation_type
+        FROM concept_relations
+        WHERE from_concept_id IN ({id_list})
+          AND to_concept_id IN ({id_list})
+          AND relation_type IN ({type_list})
+    """), params)
+    return [tuple(row) for row in rows]
+
+
+def reaches(db: Session, start_id: str, target_id: str, types: Sequence[str]) -> bool:
+    """True if `target_id` is reachable from `start_id` following edges of `types`."""
+    type_list, params = _in_clause("type_", types)
+    params.update({"start": start_id, "target": target_id})
+    row = db.execute(text(f"""
+        WITH RECURSIVE walk(concept_id) AS (
+            SELECT :start
+            UNION
+            SELECT r.to_concept_id
+            FROM concept_relations r JOIN walk w ON r.from_concept_id = w.concept_id
+            WHERE r.relation_type IN ({type_list})
+        )
+        SELECT 1 FROM walk WHERE concept_id = :target LIMIT 1
+    """), params).first()
+    return row is not None
+
+
+def find_cycles(nodes: Sequence[str], edges: Sequence[Edge]) -> List[List[str]]:
+    """Strongly connected components with more than one node (or a self-loop), via Tarjan."""
+    adjacency = defaultdict(list)
+    self_loops = set()
+    for src, dst, _ in edges:
+        adjacency[src].append(dst)
+        if src == dst:
+            self_loops.add(src)
+
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    on_stack = set()
+    stack: List[str] = []
+    cycles: List[List[str]] = []
+    counter = 0
+
+    for start in nodes:
+        if start in index:
+            continue
+        # Iterative DFS so deep skill trees cannot hit the recursion limit
+        work = [(start, iter(adjacency[start]))]
+        index[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            node, neighbours = work[-1]
+            advanced = False
+            for nxt in neighbours:
+                if nxt not in index:
+                    index[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(adjacency[nxt])))
+                    advanced = True
+                    break
+                if nxt in on_stack:
+                    low[node] = min(low[node], index[nxt])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1 or node in self_loops:
+                    cycles.append(list(reversed(component)))
+    return cycles
+
+
+def curriculum_order(nodes: Sequence[str], edges: Sequence[Edge],
+                     tie_break: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Topological order with prerequisites first (Kahn's algorithm).
+    Only ORDERING_TYPES edges constrain the order. Nodes caught in a cycle
+    are left out; use find_cycles() to report them.
+    `tie_break` maps id -> sort key (e.g. title) to make the order stable.
+    """
+    tie_break = tie_break or {}
+    node_set = set(nodes)
+    dependents = defaultdict(list)
+    pending = {n: 0 for n in nodes}
+    for src, dst, rel_type in edges:
+        if rel_type not in ORDERING_TYPES or src == dst:
+            continue
+        if src in node_set and dst in node_set:
+            # dst must come before src
+            dependents[dst].append(src)
+            pending[src] += 1
+
+    key = lambda n: (tie_break.get(n, ""), n)
+    ready = deque(sorted((n for n, count in pending.items() if count == 0), key=key))
+    order = []
+    while ready:
+        node = ready.popleft()
+        order.append(node)
+        unlocked = []
+        for nxt in dependents[node]:
+            pending[nxt] -= 1
+            if pending[nxt] == 0:
+                unlocked.append(nxt)
+        ready.extend(sorted(unlocked, key=key))
+    return order
@@ -0,0 +1,207 @@
+# app/services/concept_versions.py
+"""
+Revision storage for concept bodies.
+
+Every ``SNAPSHOT_EVERY``-th revision (and any revision whose delta would not
+be meaningfully smaller than the text) is stored in full; the ones in
+between store a line-based delta against the previous revision. Rebuilding
+any revision therefore reads one snapshot plus at most
+``SNAPSHOT_EVERY - 1`` deltas, in two queries.
+
+Delta format (JSON list, applied to ``old.splitlines(keepends=True)``):
+    [n]          copy the next n lines of the old text
+    [-n]         skip the next n lines of the old text
+    ["text..."]  insert text
+"""
+import difflib
+import hashlib
+import json
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.concept_version import ConceptVersion
+
+SNAPSHOT_EVERY = 10
+# Store a snapshot instead when the delta is more than this fraction of the text
+MAX_DELTA_RATIO = 0.6
+
+
+def body_hash(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def make_delta(old: str, new: str) -> list:
+    old_lines = (old or "").splitlines(keepends=True)
+    new_lines = (new or "").splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append([-(i2 - i1)])
+        if j2 > j1:
+            ops.append(["".join(new_lines[j1:j2])])
+    return ops
+
+
+def apply_delta(old: str, ops: list) -> str:
+    old_lines = (old or "").splitlines(keepends=True)
+    out = []
+    pos = 0
+    for (op,) in ops:
+        if isinstance(op, str):
+            out.append(op)
+        elif op >= 0:
+            out.extend(old_lines[pos:pos + op])
+            pos += op
+        else:
+            pos -= op
+    return "".join(out)
+
+
+def latest(db: Session, concept_id: str) -> Optional[ConceptVersion]:
+    return (
+        db.query(ConceptVersion)
+        .filter(ConceptVersion.concept_id == concept_id)
+        .order_by(ConceptVersion.version_no.desc())
+        .first()
+    )
+
+
+def reconstruct(db: Session, concept_id: str, version_no: int) -> Optional[str]:
+    """Full text of one revision, or None if it does not exist."""
+    target = (
+        db.query(ConceptVersion.base_version)
+        .filter(ConceptVersion.concept_id == concept_id, ConceptVersion.version_no == version_no)
+        .first()
+    )
+    if target is None:
+        return None
+
+    chain = (
+        db.query(ConceptVersion.kind, ConceptVersion.body)
+        .filter(
+            ConceptVersion.concept_id == concept_id,
+            ConceptVersion.version_no >= target.base_version,
+            ConceptVersion.version_no <= version_no,
+        )
+        .order_by(ConceptVersion.version_no)
+        .all()
+    )
+    text = ""
+    for kind, body in chain:
+        text = body if kind == "snapshot" else apply_delta(text, json.loads(body))
+    return text
+
+
+def _encode(previous: Optional[ConceptVersion], previous_text: Optional[str], new_text: str):
+    """Return (kind, stored_body, base_version) for the revision after `previous`."""
+    version_no = previous.version_no + 1 if previous else 1
+    if previous is None or version_no - previous.base_version >= SNAPSHOT_EVERY:
+        return "snapshot", new_text, version_no
+
+    delta = json.dumps(make_delta(previous_text, new_text), separators=(",", ":"))
+    if len(delta) > MAX_DELTA_RATIO * max(len(new_text), 1):
+        return "snapshot", new_text, version_no
+    return "delta", delta, previous.base_version
+
+
+def record_version(db: Session, concept_id: str, new_text: str, previous_text: Optional[str] = None,
+                   updated_by: Optional[str] = None, change_summary: Optional[str] = None):
+    """
+    Append a revision for `concept_id`. `previous_text` is the body before the
+    change; it is used as the delta base when it matches the latest stored
+    revision, otherwise that revision is rebuilt from storage.
+    Does not commit.
+    """
+    new_text = new_text or ""
+    previous = latest(db, concept_id)
+    if previous is not None:
+        if previous.body_hash == body_hash(new_text):
+            return previous  # body unchanged, nothing to record
+        if previous_text is None or body_hash(previous_text) != previous.body_hash:
+            previous_text = reconstruct(db, concept_id, previous.version_no)
+
+    kind, stored, base_version = _encode(previous, previous_text, new_text)
+    version = ConceptVersion(
+        concept_id=concept_id,
+        body=stored,
+        updated_by=updated_by,
+        change_summary=change_summary,
+        version_no=previous.version_no + 1 if previous else 1,
+        kind=kind,
+        base_version=base_version,
+        body_hash=body_hash(new_text),
+        body_length=len(new_text),
+    )
+    db.add(version)
+    return version
+
+
+def _meta_query(db: Session, concept_id: str):
+    return (
+        db.query(
+            ConceptVersion.version_no,
+            ConceptVersion.kind,
+            ConceptVersion.updated_at,
+            ConceptVersion.updated_by,
+            ConceptVersion.change_summary,
+            ConceptVersion.body_length,
+        )
+        .filter(ConceptVersion.concept_id == concept_id)
+    )
+
+
+def list_versions(db: Session, concept_id: str):
+    """Revision metadata only; bodies are never loaded."""
+    return _meta_query(db, concept_id).order_by(ConceptVersion.version_no.desc()).all()
+
+
+def version_meta(db: Session, concept_id: str, version_no: int):
+    return _meta_query(db, concept_id).filter(ConceptVersion.version_no == version_no).first()
+
+
+def unified_diff(old: str, new: str, old_label: str, new_label: str) -> List[str]:
+    return list(difflib.unified_diff(
+        (old or "").splitlines(keepends=True),
+        (new or "").splitlines(keepends=True),
+        fromfile=old_label,
+        tofile=new_label,
+    ))
+
+
+def compact(db: Session, concept_id: str) -> int:
+    """
+    Re-encode every stored revision of a concept with the snapshot/delta
+    policy (used by the migration for rows written before it existed).
+    Returns the number of revisions rewritten.
+    """
+    rows = (
+        db.query(ConceptVersion)
+        .filter(ConceptVersion.concept_id == concept_id)
+        .order_by(ConceptVersion.version_no, ConceptVersion.updated_at)
+        .all()
+    )
+    texts = []
+    for row in rows:
+        texts.append(row.body if row.kind in (None, "snapshot") else None)
+    # Rebuild any existing deltas first so every text is known
+    for i, row in enumerate(rows):
+        if texts[i] is None:
+            texts[i] = apply_delta(texts[i - 1] if i else "", json.loads(row.body))
+
+    previous = None
+    for i, row in enumerate(rows):
+        kind, stored, base_version = _encode(previous, texts[i - 1] if i else None, texts[i])
+        row.version_no = i + 1
+        row.kind = kind
+        row.body = stored
+        row.base_version = base_version
+        row.body_hash = body_hash(texts[i])
+        row.body_length = len(texts[i])
+        previous = row
+    return len(rows)
+
@@ -0,0 +1,199 @@
+# app/services/encyclopedia_io.py
+"""
+Streaming NDJSON export/import of the encyclopedia.
+
+Each line is one JSON object ``{"type": <record type>, "data": {...}}``.
+Records come out table by table in dependency order (tags, concepts,
+drills, tag links, relations, concept links, versions), preceded by a
+``header`` line, so an import can insert them as they arrive.
+
+Both directions stream: the export pages through each table with
+``yield_per`` and the import buffers at most ``batch_size`` rows per table
+before an upsert-by-primary-key executemany and a commit. Versions are
+upserted on (concept_id, version_no) instead: their ids are random per
+install, so the same revision usually exists locally under another id.
+"""
+import json
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import DateTime, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.models.concept import Concept
+from app.models.concept_link import ConceptLink
+from app.models.concept_relation import ConceptRelation
+from app.models.concept_tag import concept_tags
+from app.models.concept_version import ConceptVersion
+from app.models.drill import Drill
+from app.models.drill_tags import drill_tags
+from app.models.tag import Tag
+
+FORMAT_NAME = "encyclopedia-ndjson"
+FORMAT_VERSION = 1
+
+# (record type, table) in foreign-key order
+TABLES = [
+    ("tag", Tag.__table__),
+    ("concept", Concept.__table__),
+    ("drill", Drill.__table__),
+    ("concept_tag", concept_tags),
+    ("drill_tag", drill_tags),
+    ("relation", ConceptRelation.__table__),
+    ("link", ConceptLink.__table__),
+    ("version", ConceptVersion.__table__),
+]
+TABLES_BY_TYPE = dict(TABLES)
+
+# Upsert key for tables not matched on their primary key; the local id is kept
+CONFLICT_KEYS = {
+    "version": ["concept_id", "version_no"],
+}
+
+EXPORT_PAGE_SIZE = 1000
+IMPORT_BATCH_SIZE = 5000
+
+
+def _dumps(record: dict) -> str:
+    return json.dumps(record, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v),
+                      separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+def export_lines(db: Session, chunk_lines: int = 500) -> Iterator[str]:
+    """Yield the whole encyclopedia as NDJSON text, a few hundred lines per chunk."""
+    yield _dumps({
+        "type": "header",
+        "data": {"format": FORMAT_NAME, "version": FORMAT_VERSION, "exported_at": datetime.utcnow()},
+    })
+    buffer: List[str] = []
+    for record_type, table in TABLES:
+        stmt = select(table).order_by(*table.primary_key.columns)
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_PAGE_SIZE))
+        for row in result.mappings():
+            buffer.append(_dumps({"type": record_type, "data": dict(row)}))
+            if len(buffer) >= chunk_lines:
+                yield "".join(buffer)
+                buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+class Importer:
+    """
+    Incremental NDJSON importer. Feed it lines with ``add_line()`` and call
+    ``finish()`` at the end; rows are upserted by primary key in batches.
+
+    Tags are matched by name: an imported tag whose name already exists
+    under another id is mapped onto the existing row.
+    """
+
+    def __init__(self, db: Session, batch_size: int = IMPORT_BATCH_SIZE,
+                 progress: Optional[Callable[[Dict[str, int]], None]] = None):
+        self.db = db
+        self.batch_size = batch_size
+        self.progress = progress
+        self.counts: Dict[str, int] = {record_type: 0 for record_type, _ in TABLES}
+        self.lines = 0
+        self._pending: Dict[str, List[dict]] = {record_type: [] for record_type, _ in TABLES}
+        self._buffered = 0
+        self._tag_ids: Dict[str, str] = {}  # imported tag id -> id in this database
+
+    def add_line(self, line):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            return
+        self.lines += 1
+        try:
+            record = json.loads(line)
+            record_type, data = record["type"], record["data"]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(f"Line {self.lines}: not a valid export record")
+
+        if record_type == "header":
+            if data.get("format") != FORMAT_NAME or data.get("version", 0) > FORMAT_VERSION:
+                raise ValueError(f"Unsupported export format: {data.get('format')} v{data.get('version')}")
+            return
+        if record_type not in TABLES_BY_TYPE:
+            raise ValueError(f"Line {self.lines}: unknown record type '{record_type}'")
+
+        self._pending[record_type].append(self._coerce(TABLES_BY_TYPE[record_type], data))
+        self._buffered += 1
+        if self._buffered >= self.batch_size:
+            self.flush()
+
+    @staticmethod
+    def _coerce(table, data: dict) -> dict:
+        row = {}
+        for column in table.columns:
+            if column.name not in data:
+                continue
+            value = data[column.name]
+            if value is not None and isinstance(column.type, DateTime) and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            row[column.name] = value
+        return row
+
+    def _remap_tags(self, rows: List[dict]) -> List[dict]:
+        names = [row["name"] for row in rows]
+        existing = dict(self.db.query(Tag.name, Tag.id).filter(Tag.name.in_(names)).all())
+        fresh = []
+        for row in rows:
+            self._tag_ids[row["id"]] = existing.get(row["name"], row["id"])
+            if row["name"] not in existing:
+                fresh.append(row)
+        return fresh
+
+    def flush(self):
+        """Write every buffered row in dependency order, then commit."""
+        for record_type, table in TABLES:
+            rows = self._pending[record_type]
+            if not rows:
+                continue
+            self.counts[record_type] += len(rows)
+
+            if record_type == "tag":
+                rows = self._remap_tags(rows)
+            elif record_type in ("concept_tag", "drill_tag"):
+                for row in rows:
+                    row["tag_id"] = self._tag_ids.get(row["tag_id"], row["tag_id"])
+
+            if rows:
+                self._upsert(table, rows, CONFLICT_KEYS.get(record_type))
+            self._pending[record_type] = []
+
+        self.db.commit()
+        self._buffered = 0
+        if self.progress:
+            self.progress(dict(self.counts))
+
+    def _upsert(self, table, rows: List[dict], key: Optional[List[str]] = None):
+        pk = [c.name for c in table.primary_key.columns]
+        key = key or pk
+        # Group by key set so each executemany has a uniform parameter shape
+        by_shape: Dict[tuple, List[dict]] = {}
+        for row in rows:
+            by_shape.setdefault(tuple(sorted(row)), []).append(row)
+
+        for shape, shaped_rows in by_shape.items():
+            stmt = insert(table)
+            updates = {name: stmt.excluded[name] for name in shape if name not in pk and name not in key}
+            if updates:
+                stmt = stmt.on_conflict_do_update(index_elements=key, set_=updates)
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=key)
+            self.db.execute(stmt, shaped_rows)
+
+    def finish(self) -> Dict[str, int]:
+        self.flush()
+        return dict(self.counts)
+
+
+def import_lines(db: Session, lines: Iterable, batch_size: int = IMPORT_BATCH_SIZE,
+                 progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+    importer = Importer(db, batch_size=batch_size, progress=progress)
+    for line in lines:
+        importer.add_line(line)
+    return importer.finish()
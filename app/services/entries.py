@@ -0,0 +1,110 @@
+# app/services/entries.py
+"""
+Entry resolution across the two encyclopedia tables.
+
+Concepts and drills share one id space (UUIDs) and most routes accept
+either. Instead of querying ``concepts`` and then ``drills``, callers ask
+this module: the entry type comes from a process-local id -> type registry
+(filled on first sight, on create, and cleared on delete), and the row is
+then loaded with its tags in one joined query.
+
+A cold lookup costs one statement that probes both primary-key indexes
+(``UNION ALL ... LIMIT 1``); a warm lookup costs none.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.concept import Concept
+from app.models.drill import Drill
+
+CONCEPT = "concept"
+DRILL = "drill"
+MODELS = {CONCEPT: Concept, DRILL: Drill}
+
+MAX_ENTRIES = 50_000
+
+_types: "OrderedDict[str, str]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def remember(entry_id: str, entry_type: str):
+    with _lock:
+        _types[entry_id] = entry_type
+        _types.move_to_end(entry_id)
+        while len(_types) > MAX_ENTRIES:
+            _types.popitem(last=False)
+
+
+def forget(entry_id: str):
+    with _lock:
+        _types.pop(entry_id, None)
+
+
+def _cached(entry_id: str) -> Optional[str]:
+    with _lock:
+        return _types.get(entry_id)
+
+
+def resolve_type(db: Session, entry_id: str) -> Optional[str]:
+    """'concept', 'drill' or None."""
+    entry_type = _cached(entry_id)
+    if entry_type:
+        return entry_type
+
+    probe = union_all(
+        select(literal(CONCEPT)).where(Concept.id == entry_id),
+        select(literal(DRILL)).where(Drill.id == entry_id),
+    ).limit(1)
+    entry_type = db.execute(probe).scalar()
+    if entry_type:
+        remember(entry_id, entry_type)
+    return entry_type
+
+
+def load_entry(db: Session, entry_id: str, with_tags: bool = True
+               ) -> Tuple[Optional[str], Optional[Union[Concept, Drill]]]:
+    """
+    Return (entry_type, row) or (None, None). With `with_tags` the tags are
+    joined into the same SELECT.
+    """
+    entry_type = resolve_type(db, entry_id)
+    if entry_type is None:
+        return None, None
+
+    model = MODELS[entry_type]
+    query = db.query(model)
+    if with_tags:
+        query = query.options(joinedload(model.tags))
+    row = query.filter(model.id == entry_id).first()
+
+    if row is None:
+        # Deleted by another worker since we cached its type
+        forget(entry_id)
+        return None, None
+    return entry_type, row
+
+
+def load_titles(db: Session, entry_ids) -> dict:
+    """
+    Bulk variant for listings: {entry_id: (entry_type, title)} for every id
+    that exists, in a single query over both tables.
+    """
+    entry_ids = list(set(entry_ids))
+    if not entry_ids:
+        return {}
+    stmt = union_all(
+        select(Concept.id, literal(CONCEPT), Concept.title).where(Concept.id.in_(entry_ids)),
+        select(Drill.id, literal(DRILL), Drill.title).where(Drill.id.in_(entry_ids)),
+    )
+    found = {}
+    for entry_id, entry_type, title in db.execute(stmt):
+        # Drills win on the (theoretical) id clash, as the old lookups did
+        if entry_id not in found or entry_type == DRILL:
+            found[entry_id] = (entry_type, title)
+    for entry_id, (entry_type, _) in found.items():
+        remember(entry_id, entry_type)
+    return found
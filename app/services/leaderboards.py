@@ -0,0 +1,196 @@
+# app/services/leaderboards.py
+"""
+Cross-player rankings over session metrics.
+
+``player_stats`` produces one value per player (their max or mean of a
+metric) for the given filters. The date range is split into whole seasons,
+whole months and leftover days, and read from the precomputed
+``metric_rollups`` cells for those periods (at most one row per player for a
+metric, pitch type and period), so the cost does not depend on how many raw
+rows fall in the range. A range is first clamped to the dates that have
+sessions, so an open-ended one (start or end missing) splits like any other.
+
+``top_values`` ranks individual values (single pitches or session-level
+values) and scans the (metric_id, value) index from the top.
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.services.metric_rollups import EFFECTIVE_ROWS
+
+
+def _month_end(day: date) -> date:
+    return date(day.year, day.month, calendar.monthrange(day.year, day.month)[1])
+
+
+def split_range(start: date = None, end: date = None) -> list:
+    """Rollup periods that together cover start..end exactly (both set, or neither for "all")."""
+    if start is None and end is None:
+        return ["all"]
+
+    periods = []
+    day = start
+    while day <= end:
+        month_end = _month_end(day)
+        year_end = date(day.year, 12, 31)
+        if day.month == 1 and day.day == 1 and year_end <= end:
+            periods.append(f"{day.year:04d}")
+            day = year_end
+        elif day.day == 1 and month_end <= end:
+            periods.append(f"{day.year:04d}-{day.month:02d}")
+            day = month_end
+        else:
+            periods.append(day.isoformat())
+        if day >= end:  # not `day += 1` first: end may be date.max
+            break
+        day += timedelta(days=1)
+    return periods
+
+
+def clamp_range(db: Session, start: date = None, end: date = None):
+    """
+    start..end narrowed to the first..last session date, filling in a missing
+    bound. None when no session can fall in the range.
+    """
+    first, last = db.execute(text("SELECT MIN(date), MAX(date) FROM sessions")).one()
+    if first is None:
+        return None
+    first, last = datetime.fromisoformat(first).date(), datetime.fromisoformat(last).date()
+    start = max(start, first) if start else first
+    end = min(end, last) if end else last
+    return (start, end) if start <= end else None
+
+
+def rollup_period(start: date = None, end: date = None):
+    """The single rollup period a date range maps onto exactly, or None."""
+    if (start is None) != (end is None) or (start and start > end):
+        return None
+    periods = split_range(start, end)
+    return periods[0] if len(periods) == 1 else None
+
+
+def _metric_filters(params: dict, source=None, pitch_type=None, alias="sm"):
+    filters = []
+    if source:
+        filters.append("AND d.source = :source")
+        params["source"] = source
+    if pitch_type:
+        filters.append(f"AND COALESCE({alias}.pitch_type, '') = :pitch_type")
+        params["pitch_type"] = pitch_type
+    return "\n  ".join(filters)
+
+
+def _player_filters(params: dict, team=None, position=None):
+    filters = []
+    if team:
+        filters.append("AND p.team = :team")
+        params["team"] = team
+    if position:
+        filters.append("AND p.position = :position")
+        params["position"] = position
+    return "\n  ".join(filters)
+
+
+def _bound(day: date) -> str:
+    return datetime.combine(day, time.min).isoformat(" ")
+
+
+def _date_bounds(params: dict, start: date = None, end: date = None) -> str:
+    """SQL condition on sessions `s` for the start..end day range."""
+    parts = ["1"]
+    if start:
+        parts.append("s.date >= :start")
+        params["start"] = _bound(start)
+    if end:
+        parts.append("s.date < :end")
+        params["end"] = _bound(end + timedelta(days=1))
+    return " AND ".join(parts)
+
+
+def player_stats(db: Session, metric: str, stat: str = "max", source: str = None, pitch_type: str = None,
+                 team: str = None, position: str = None, start: date = None, end: date = None,
+                 min_count: int = 1, limit: int = None):
+    """
+    [(player_id, first_name, last_name, team, position, value, count)] ordered
+    by value, best first.
+    """
+    if start is None and end is None:
+        periods = ["all"]
+    else:
+        bounds = clamp_range(db, start, end)
+        if bounds is None:
+            return []
+        periods = split_range(*bounds)
+    params = {"metric": metric, "min_count": min_count, "periods": periods}
+
+    value_expr = "MAX(r.max)" if stat == "max" else "SUM(r.sum) / SUM(r.count)"
+    sql = f"""
+        SELECT p.id, p.first_name, p.last_name, p.team, p.position, {value_expr} AS value, SUM(r.count) AS n
+        FROM metric_definitions d
+        JOIN metric_rollups r ON r.metric_id = d.id AND r.period IN :periods
+        JOIN players p ON p.id = r.player_id
+        WHERE d.name = :metric
+          {_metric_filters(params, source, pitch_type, alias="r")}
+          {_player_filters(params, team, position)}
+        GROUP BY p.id
+        HAVING n >= :min_count
+        ORDER BY value DESC, p.id
+    """
+    if limit:
+        sql += "\nLIMIT :limit"
+        params["limit"] = limit
+
+    stmt = text(sql).bindparams(bindparam("periods", expanding=True))
+    return db.execute(stmt, params).all()
+
+
+def top_values(db: Session, metric: str, source: str = None, pitch_type: str = None, team: str = None,
+               position: str = None, start: date = None, end: date = None, limit: int = 20):
+    """Best individual values, e.g. the hardest pitches thrown this month."""
+    params = {"metric": metric, "limit": limit}
+    filters = _metric_filters(params, source, pitch_type) + "\n  " + _player_filters(params, team, position)
+    # Resolved up front so the planner can walk the (metric_id, value) index
+    metric_ids = db.execute(
+        text("SELECT id FROM metric_definitions d WHERE d.name = :metric"
+             + (" AND d.source = :source" if source else "")),
+        {"metric": metric, "source": source}
+    ).scalars().all()
+    if not metric_ids:
+        return []
+    params["metric_ids"] = metric_ids
+
+    sql = f"""
+        SELECT p.id, p.first_name, p.last_name, p.team, p.position,
+               sm.value, d.source, sm.pitch_type, s.id, s.date, sm.pitch_no
+        FROM session_metrics sm
+        JOIN metric_definitions d ON d.id = sm.metric_id
+        JOIN sessions s ON s.id = sm.session_id
+        JOIN players p ON p.id = s.player_id
+        WHERE sm.metric_id IN :metric_ids
+          AND {EFFECTIVE_ROWS}
+          AND {_date_bounds(params, start, end)}
+          {filters}
+        ORDER BY sm.value DESC
+        LIMIT :limit
+    """
+    stmt = text(sql).bindparams(bindparam("metric_ids", expanding=True))
+    return db.execute(stmt, params).all()
+
+
+def ranks(values):
+    """Competition ranks (1, 2, 2, 4) for values already sorted best first."""
+    result, previous = [], object()
+    for i, value in enumerate(values):
+        result.append(result[-1] if value == previous else i + 1)
+        previous = value
+    return result
+
+
+def percentile_rank(population, value) -> float:
+    """Percent of the population below `value`, counting ties as half."""
+    below = sum(1 for v in population if v < value)
+    equal = sum(1 for v in population if v == value)
+    return round(100.0 * (below + 0.5 * equal) / len(population), 1)
@@ -0,0 +1,176 @@
+# app/services/media_derivatives.py
+"""
+Derivatives of media store blobs: resized image variants and video posters.
+
+``schedule(blob)`` hands a freshly stored blob to a bounded process pool
+(MEDIA_DERIVATIVE_WORKERS processes, at most MEDIA_DERIVATIVE_QUEUE jobs
+waiting). When the queue is full the job is skipped; it is picked up by
+app/rebuild_media_derivatives.py. A worker that dies (e.g. OOM on a huge
+image) breaks the pool; it is then replaced on the next job, and the jobs
+it took down are skipped the same way. Rendering itself lives in media_render.
+When a job finishes its rows are written to ``media_derivatives`` and the
+encyclopedia response cache is bumped so ConceptOut picks the URLs up.
+
+Derived files are content-addressed like their blob
+(derived/<aa>/<sha256>-<variant>.<ext>), so they are served with the same
+long-lived immutable cache headers.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.media_blob import MediaDerivative
+from app.services import media_render, media_store, response_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = int(os.environ.get("MEDIA_DERIVATIVE_WORKERS", "2"))
+MAX_QUEUED = int(os.environ.get("MEDIA_DERIVATIVE_QUEUE", "32"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_QUEUED)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs server threads is not safe
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next job starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _job(blob: media_store.Blob):
+    """(callable, args) rendering `blob`, or None if it has no derivatives."""
+    kind = media_render.kind_of(blob.ext, blob.content_type)
+    if kind is None:
+        return None
+    directory = os.path.dirname(media_store.derived_path(blob.sha256, ""))
+    return media_render.render, (blob.path, directory, blob.sha256, kind)
+
+
+def schedule(blob: media_store.Blob, session_factory=SessionLocal) -> bool:
+    """Render `blob`'s derivatives in the background. False if skipped."""
+    job = _job(blob)
+    if job is None:
+        return False
+    if not _slots.acquire(blocking=False):
+        logger.warning("Derivative queue full, skipping %s", blob.sha256)
+        return False
+    # Called after the upload is committed: never fail the request over a derivative
+    pool = None
+    try:
+        pool = _get_pool()
+        future = pool.submit(job[0], *job[1])
+    except Exception as e:
+        _slots.release()
+        if isinstance(e, BrokenProcessPool):
+            _discard_pool(pool)
+        logger.exception("Could not schedule derivatives of %s", blob.sha256)
+        return False
+    future.add_done_callback(lambda f: _finish(blob.sha256, f, session_factory, pool))
+    return True
+
+
+def _finish(sha256: str, future, session_factory, pool: ProcessPoolExecutor = None):
+    _slots.release()
+    try:
+        results = future.result()
+    except BrokenProcessPool:
+        logger.error("Derivative worker died rendering %s; restarting the pool", sha256)
+        if pool is not None:
+            _discard_pool(pool)
+        return
+    except Exception:
+        logger.exception("Rendering derivatives of %s failed", sha256)
+        return
+    if results:
+        with session_factory() as db:
+            record(db, sha256, results)
+            db.commit()
+
+
+def render_all(blobs) -> dict:
+    """Render several blobs on the pool and wait: sha256 -> results. Failures are logged and left out."""
+    futures = {}
+    broken = False
+    pool = _get_pool()
+    for blob in blobs:
+        job = _job(blob)
+        if job is None:
+            continue
+        try:
+            futures[blob.sha256] = pool.submit(job[0], *job[1])
+        except BrokenProcessPool:
+            broken = True
+            break
+    rendered = {}
+    for sha256, future in futures.items():
+        try:
+            rendered[sha256] = future.result()
+        except BrokenProcessPool:
+            broken = True
+            logger.error("Derivative worker died rendering %s", sha256)
+        except Exception:
+            logger.exception("Rendering derivatives of %s failed", sha256)
+    if broken:
+        _discard_pool(pool)
+    return rendered
+
+
+def record(db: Session, sha256: str, results: list):
+    """Store render results for a blob. Does not commit."""
+    for result in results:
+        values = {key: result[key] for key in ("variant", "name", "width", "height", "size")}
+        db.execute(
+            insert(MediaDerivative)
+            .values(sha256=sha256, **values)
+            .on_conflict_do_update(index_elements=[MediaDerivative.sha256, MediaDerivative.variant], set_=values)
+        )
+    response_cache.bump(db)
+
+
+def variants_for(db: Session, urls) -> dict:
+    """media URL -> {variant: derivative URL} for the store URLs among `urls` that have any."""
+    by_sha = defaultdict(list)
+    for url in urls:
+        sha256 = media_store.blob_key(url)
+        if sha256:
+            by_sha[sha256].append(url)
+    if not by_sha:
+        return {}
+
+    variants = defaultdict(dict)
+    for sha256, variant, name in (
+        db.query(MediaDerivative.sha256, MediaDerivative.variant, MediaDerivative.name)
+        .filter(MediaDerivative.sha256.in_(by_sha))
+    ):
+        for url in by_sha[sha256]:
+            variants[url][variant] = media_store.derived_url(sha256, name)
+    return dict(variants)
@@ -0,0 +1,110 @@
+# app/services/media_render.py
+"""
+Rendering of media derivatives: resized image variants and video posters.
+
+Runs inside the derivative process pool (see media_derivatives.py), so it
+only depends on the standard library, Pillow and the ffmpeg binary, never
+on the app or the database. Both are optional: without Pillow no image
+variants are made, without ffmpeg no posters.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow not installed
+    Image = None
+
+# variant -> longest side in pixels
+IMAGE_VARIANTS = {"thumb": 320, "medium": 1280}
+POSTER_WIDTH = 640
+POSTER_OFFSETS = ("1", "0")  # seconds into the clip; 0 for clips shorter than a second
+FFMPEG_TIMEOUT_SECONDS = 60
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tif", ".tiff", ".heic"}
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v", ".webm", ".avi", ".mkv", ".3gp"}
+
+
+def kind_of(ext: str, content_type: str = None) -> str:
+    """"image", "video" or None for anything without derivatives."""
+    content_type = content_type or ""
+    if content_type.startswith("image/") or ext in IMAGE_EXTENSIONS:
+        return "image"
+    if content_type.startswith("video/") or ext in VIDEO_EXTENSIONS:
+        return "video"
+    return None
+
+
+def _output(directory: str, name: str, write):
+    """Write through a temp file in `directory` and rename into place."""
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".render-", suffix=os.path.splitext(name)[1])
+    os.close(fd)
+    try:
+        write(temp_path)
+        path = os.path.join(directory, name)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+    return path
+
+
+def render_image(source: str, directory: str, stem: str) -> list:
+    if Image is None:
+        return []
+    results = []
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        longest = max(original.size)
+        for variant, bound in IMAGE_VARIANTS.items():
+            # No point in a "medium" that is as large as the original
+            if bound >= longest and variant != "thumb":
+                continue
+            image = original.copy()
+            image.thumbnail((bound, bound))
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            name = f"{stem}-{variant}.webp"
+            path = _output(directory, name, lambda p: image.save(p, "WEBP", quality=80, method=4))
+            results.append({
+                "variant": variant, "name": name, "width": image.width, "height": image.height,
+                "size": os.path.getsize(path),
+            })
+    return results
+
+
+def render_poster(source: str, directory: str, stem: str) -> list:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return []
+    name = f"{stem}-poster.jpg"
+    for offset in POSTER_OFFSETS:
+        def grab(path):
+            subprocess.run(
+                [ffmpeg, "-v", "error", "-y", "-ss", offset, "-i", source, "-frames:v", "1",
+                 "-vf", f"scale='min({POSTER_WIDTH},iw)':-2", "-q:v", "4", path],
+                check=True, timeout=FFMPEG_TIMEOUT_SECONDS, stdin=subprocess.DEVNULL,
+            )
+            if not os.path.getsize(path):
+                raise subprocess.CalledProcessError(1, ffmpeg)
+        try:
+            path = _output(directory, name, grab)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            continue
+        return [{"variant": "poster", "name": name, "width": None, "height": None, "size": os.path.getsize(path)}]
+    return []
+
+
+def render(source: str, directory: str, stem: str, kind: str) -> list:
+    """
+    Render every derivative of the file at `source` into `directory` as
+    <stem>-<variant>.<ext>. Returns [{variant, name, width, height, size}].
+    """
+    os.makedirs(directory, exist_ok=True)
+    if kind == "image":
+        return render_image(source, directory, stem)
+    if kind == "video":
+        return render_poster(source, directory, stem)
+    return []
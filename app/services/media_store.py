@@ -0,0 +1,278 @@
+# app/services/media_store.py
+"""
+Content-addressed store for uploaded media.
+
+Every file is kept once under MEDIA_DIR/<first two hex digits>/<sha256><ext>
+and served at /media/<same path> with immutable cache headers (see
+app/routers/media.py). Uploading bytes that are already stored
+returns the existing blob, so the same clip attached to three drills takes
+disk space once.
+
+``media_refs`` records which rows point at which blob: concepts
+(media_files), drills (media_files, video_url) and sessions (their
+SessionMedia file_urls). Routes replace an owner's refs with ``set_refs``
+whenever they write its media, and ``drop_refs`` when they delete it, in
+the same transaction. ``rebuild_refs`` rescans every owner.
+
+``collect_garbage`` deletes blobs nothing references. A fresh upload is not
+referenced until the form that uploaded it is saved, so only blobs last
+uploaded more than GC_GRACE ago are reclaimed. ``start_gc`` runs it
+periodically in a daemon thread.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from fastapi import UploadFile
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.models.concept import Concept
+from app.models.drill import Drill
+from app.models.media_blob import MediaBlob, MediaDerivative, MediaRef
+from app.models.session import SessionMedia
+from app.services import uploads
+
+logger = logging.getLogger(__name__)
+
+BACKEND_URL = "http://localhost:8000"
+MEDIA_DIR = os.environ.get("MEDIA_DIR", "media")
+MEDIA_PREFIX = "/media"
+DERIVED_DIR = os.path.join(MEDIA_DIR, "derived")
+os.makedirs(MEDIA_DIR, exist_ok=True)
+
+# Every path under /media names content that never changes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+GC_GRACE = timedelta(hours=int(os.environ.get("MEDIA_GC_GRACE_HOURS", "24")))
+GC_INTERVAL_SECONDS = int(os.environ.get("MEDIA_GC_INTERVAL_SECONDS", "3600"))
+
+CONCEPT = "concept"
+DRILL = "drill"
+SESSION = "session"
+
+_BLOB_URL = re.compile(r"/media/[0-9a-f]{2}/([0-9a-f]{64})(\.[A-Za-z0-9]+)?$")
+_EXT = re.compile(r"^\.[A-Za-z0-9]{1,10}$")
+
+
+@dataclass
+class Blob:
+    sha256: str
+    ext: str
+    size: int
+    content_type: str = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.sha256[:2]}/{self.sha256}{self.ext}"
+
+    @property
+    def path(self) -> str:
+        return os.path.join(MEDIA_DIR, self.sha256[:2], f"{self.sha256}{self.ext}")
+
+    @property
+    def url(self) -> str:
+        return f"{BACKEND_URL}{MEDIA_PREFIX}/{self.name}"
+
+
+def derived_path(sha256: str, name: str) -> str:
+    return os.path.join(DERIVED_DIR, sha256[:2], name)
+
+
+def derived_url(sha256: str, name: str) -> str:
+    return f"{BACKEND_URL}{MEDIA_PREFIX}/derived/{sha256[:2]}/{name}"
+
+
+def blob_key(url: str):
+    """sha256 of the blob a media URL points at, or None for anything else (links, legacy files)."""
+    match = _BLOB_URL.search(url or "")
+    return match.group(1) if match else None
+
+
+def _extension(filename: str) -> str:
+    ext = os.path.splitext(uploads.safe_name(filename))[1].lower()
+    return ext if _EXT.match(ext) else ""
+
+
+# -------------------------------
+# Writing blobs
+# -------------------------------
+def put(db: Session, source, filename: str = None, content_type: str = None, max_bytes: int = None) -> Blob:
+    """
+    Store the binary file object `source`, deduplicated by content. Blocking;
+    adds the blob row to the caller's transaction.
+    """
+    spooled = uploads.spool(source, MEDIA_DIR, max_bytes)
+    try:
+        now = datetime.utcnow()
+        db.execute(
+            insert(MediaBlob)
+            .values(sha256=spooled.sha256, ext=_extension(filename), size=spooled.size,
+                    content_type=content_type, uploaded_at=now)
+            .on_conflict_do_update(index_elements=[MediaBlob.sha256], set_={"uploaded_at": now})
+        )
+        row = db.get(MediaBlob, spooled.sha256, populate_existing=True)
+        blob = Blob(row.sha256, row.ext, row.size, row.content_type)
+
+        if os.path.exists(blob.path):
+            # Already stored: drop the copy, and refresh the mtime so a GC
+            # pass racing with this upload leaves the file alone
+            uploads.discard(spooled.path)
+            os.utime(blob.path)
+        else:
+            os.makedirs(os.path.dirname(blob.path), exist_ok=True)
+            os.replace(spooled.path, blob.path)
+    except BaseException:
+        uploads.discard(spooled.path)
+        raise
+    return blob
+
+
+async def put_upload(db: Session, file: UploadFile, max_bytes: int = None) -> Blob:
+    """``put`` and commit for async routes, run off the event loop."""
+    uploads.check_size(file, max_bytes)
+
+    def put_and_commit():
+        blob = put(db, file.file, file.filename, file.content_type, max_bytes)
+        db.commit()
+        return blob
+
+    return await run_in_threadpool(put_and_commit)
+
+
+# -------------------------------
+# Reference tracking
+# -------------------------------
+def url_list(value):
+    """A media_files column (JSON text or list) as a list of URLs."""
+    if isinstance(value, list):
+        return value
+    try:
+        parsed = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def drill_urls(drill) -> list:
+    return url_list(drill.media_files) + ([drill.video_url] if drill.video_url else [])
+
+
+def concept_urls(concept) -> list:
+    return url_list(concept.media_files)
+
+
+def set_refs(db: Session, owner_type: str, urls_by_owner: dict):
+    """Replace the refs of each owner id with the blobs its media URLs point at."""
+    if not urls_by_owner:
+        return
+    drop_refs(db, owner_type, urls_by_owner.keys())
+    rows = {
+        (sha, str(owner_id))
+        for owner_id, urls in urls_by_owner.items()
+        for sha in map(blob_key, urls)
+        if sha
+    }
+    if not rows:
+        return
+    # Only blobs the store knows about; a URL to a GC'd or foreign blob is ignored
+    known = set(db.scalars(select(MediaBlob.sha256).where(MediaBlob.sha256.in_({sha for sha, _ in rows}))))
+    values = [
+        {"sha256": sha, "owner_type": owner_type, "owner_id": owner_id}
+        for sha, owner_id in rows
+        if sha in known
+    ]
+    if values:
+        db.execute(insert(MediaRef).on_conflict_do_nothing(), values)
+
+
+def drop_refs(db: Session, owner_type: str, owner_ids):
+    owner_ids = [str(owner_id) for owner_id in owner_ids]
+    if owner_ids:
+        db.execute(delete(MediaRef).where(MediaRef.owner_type == owner_type, MediaRef.owner_id.in_(owner_ids)))
+
+
+def rebuild_refs(db: Session) -> int:
+    """Recompute every ref from the owning rows. Does not commit."""
+    db.flush()
+    db.execute(delete(MediaRef))
+    set_refs(db, CONCEPT, {c.id: concept_urls(c) for c in db.query(Concept.id, Concept.media_files)})
+    set_refs(db, DRILL, {d.id: drill_urls(d) for d in db.query(Drill.id, Drill.media_files, Drill.video_url)})
+    session_urls = defaultdict(list)
+    for session_id, file_url in db.query(SessionMedia.session_id, SessionMedia.file_url):
+        session_urls[session_id].append(file_url)
+    set_refs(db, SESSION, session_urls)
+    return db.query(MediaRef).count()
+
+
+# -------------------------------
+# Garbage collection
+# -------------------------------
+def collect_garbage(db: Session, grace: timedelta = GC_GRACE) -> dict:
+    """
+    Delete blobs with no refs that are older than `grace` (with their
+    derivatives), and abandoned temp files. Commits the row deletes before
+    touching the files.
+    """
+    cutoff = datetime.utcnow() - grace
+    orphaned = db.execute(
+        delete(MediaBlob)
+        .where(MediaBlob.uploaded_at < cutoff, ~exists().where(MediaRef.sha256 == MediaBlob.sha256))
+        .returning(MediaBlob.sha256, MediaBlob.ext, MediaBlob.size)
+    ).all()
+    derived = defaultdict(list)
+    if orphaned:
+        for sha, name in db.execute(
+            delete(MediaDerivative)
+            .where(MediaDerivative.sha256.in_([sha for sha, _, _ in orphaned]))
+            .returning(MediaDerivative.sha256, MediaDerivative.name)
+        ):
+            derived[sha].append(name)
+    db.commit()
+
+    removed, freed = 0, 0
+    cutoff_ts = time.time() - grace.total_seconds()
+    for sha, ext, size in orphaned:
+        path = Blob(sha, ext, size).path
+        try:
+            # A re-upload after the row was deleted rewrote or touched the file; keep it
+            if os.path.getmtime(path) < cutoff_ts:
+                os.unlink(path)
+                removed += 1
+                freed += size
+                for name in derived[sha]:
+                    uploads.discard(derived_path(sha, name))
+        except FileNotFoundError:
+            pass
+
+    for entry in os.scandir(MEDIA_DIR):
+        if entry.name.startswith(uploads.TEMP_PREFIX) and entry.stat().st_mtime < cutoff_ts:
+            uploads.discard(entry.path)
+
+    return {"blobs": removed, "bytes": freed}
+
+
+def start_gc(session_factory, interval: int = GC_INTERVAL_SECONDS) -> threading.Event:
+    """Run ``collect_garbage`` every `interval` seconds in a daemon thread. Set the returned event to stop."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                with session_factory() as db:
+                    result = collect_garbage(db)
+                if result["blobs"]:
+                    logger.info("Media GC removed %(blobs)d blobs, %(bytes)d bytes", result)
+            except Exception:
+                logger.exception("Media GC failed")
+
+    threading.Thread(target=loop, name="media-gc", daemon=True).start()
+    return stop
@@ -0,0 +1,110 @@
+# app/services/metric_dictionary.py
+"""
+Metric dictionary shared by everything that writes session metrics.
+
+``resolve(db, keys)`` maps (source, name, unit) keys to MetricDefinition ids,
+creating missing definitions with one batched
+``INSERT ... ON CONFLICT DO NOTHING``. Like the tag cache in tags.py, ids
+created inside a transaction only enter the process cache once it commits.
+
+``split_value`` turns an incoming metric value into the (value, value_text)
+pair stored on SessionMetric.
+"""
+import math
+import threading
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import event, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.models.metric_definition import MetricDefinition
+
+_PENDING_KEY = "pending_metric_ids"
+
+MetricKey = Tuple[str, str, str]
+
+_cache: Dict[MetricKey, int] = {}
+_lock = threading.Lock()
+
+
+def make_key(source, name, unit=None) -> MetricKey:
+    return ((source or "").strip(), (name or "").strip(), (unit or "").strip())
+
+
+def _lookup(db: Session, keys) -> Dict[MetricKey, int]:
+    if not keys:
+        return {}
+    rows = (
+        db.query(MetricDefinition.id, MetricDefinition.source, MetricDefinition.name, MetricDefinition.unit)
+        .filter(tuple_(MetricDefinition.source, MetricDefinition.name, MetricDefinition.unit).in_(keys))
+        .all()
+    )
+    return {(source, name, unit): metric_id for metric_id, source, name, unit in rows}
+
+
+def resolve(db: Session, keys: Iterable[MetricKey]) -> Dict[MetricKey, int]:
+    """
+    Return {key: metric_id} for keys built with make_key(), creating missing
+    definitions. Nothing is committed here.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+
+    with _lock:
+        ids = {key: _cache[key] for key in keys if key in _cache}
+
+    missing = [key for key in keys if key not in ids]
+    found = _lookup(db, missing)
+    ids.update(found)
+
+    to_create = [key for key in missing if key not in found]
+    if to_create:
+        db.execute(
+            insert(MetricDefinition)
+            .values([{"source": s, "name": n, "unit": u} for s, n, u in to_create])
+            .on_conflict_do_nothing(index_elements=["source", "name", "unit"])
+        )
+        created = _lookup(db, to_create)
+        ids.update(created)
+        db.info.setdefault(_PENDING_KEY, {}).update(created)
+
+    with _lock:
+        _cache.update(found)
+
+    return ids
+
+
+def split_value(raw):
+    """Incoming metric value -> (value, value_text): numbers go to the REAL column."""
+    if isinstance(raw, bool):
+        return None, str(raw)
+    if isinstance(raw, (int, float)):
+        return (float(raw), None) if math.isfinite(raw) else (None, str(raw))
+    if raw is None:
+        return None, ""
+    text = str(raw).strip()
+    try:
+        number = float(text)
+    except ValueError:
+        return None, text
+    return (number, None) if math.isfinite(number) else (None, text)
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        with _lock:
+            _cache.update(pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
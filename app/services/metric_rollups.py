@@ -0,0 +1,232 @@
+# app/services/metric_rollups.py
+"""
+Maintenance of the ``metric_rollups`` table.
+
+Every cell (player, metric, pitch type, period) keeps count, sum, sum of
+squares, min and max of the metric's values, so mean/std/min/max for a cell
+is a single primary-key read. Periods are "all", the season ("2024"), the
+month ("2024-03") and the day ("2024-03-05") of the session date, so any
+date range can be assembled from a handful of cells.
+
+Routers bracket any change to a session's metrics with
+``remove_session(db, session)`` (before) and ``add_session(db, session)``
+(after). Both aggregate only that session's rows and apply them as a delta.
+Count/sum/sum_sq are exact under subtraction; min/max are not, so a cell is
+recomputed from raw rows only when the removed values touched its current
+min or max. ``rebuild(db)`` recomputes the whole table.
+
+Values are counted the same way as the trend endpoint: imported per-pitch
+rows where a session has them, the session-level value otherwise.
+"""
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.models.metric_rollup import MetricRollup
+
+# Restricts session_metrics `sm` to the rows that carry a metric's values:
+# per-pitch rows, or the averaged row when the session has no pitch rows for it.
+# (`pitch`, not `p`: leaderboard queries alias players as `p`.)
+EFFECTIVE_ROWS = """
+    sm.value IS NOT NULL
+    AND (
+        sm.pitch_no IS NOT NULL
+        OR NOT EXISTS (
+            SELECT 1 FROM session_metrics pitch
+            WHERE pitch.session_id = sm.session_id
+              AND pitch.metric_id = sm.metric_id
+              AND pitch.pitch_type IS sm.pitch_type
+              AND pitch.pitch_no IS NOT NULL
+        )
+    )
+"""
+
+# period column expression per granularity, over sessions `s`
+PERIOD_EXPRESSIONS = (
+    "'all'", "strftime('%Y', s.date)", "strftime('%Y-%m', s.date)", "strftime('%Y-%m-%d', s.date)"
+)
+
+_SESSION_AGGREGATE_SQL = f"""
+SELECT sm.session_id, sm.metric_id, COALESCE(sm.pitch_type, '') AS pitch_type,
+       COUNT(*), SUM(sm.value), SUM(sm.value * sm.value), MIN(sm.value), MAX(sm.value)
+FROM session_metrics sm
+WHERE sm.session_id IN :session_ids AND {EFFECTIVE_ROWS}
+GROUP BY sm.session_id, sm.metric_id, COALESCE(sm.pitch_type, '')
+"""
+
+_SUBTRACT_SQL = """
+UPDATE metric_rollups
+SET count = count - :count, sum = sum - :sum, sum_sq = sum_sq - :sum_sq
+WHERE player_id = :player_id AND metric_id = :metric_id
+  AND pitch_type = :pitch_type AND period = :period
+RETURNING count, min, max
+"""
+
+_CELL_SQL = f"""
+SELECT COUNT(*), SUM(sm.value), SUM(sm.value * sm.value), MIN(sm.value), MAX(sm.value)
+FROM sessions s
+JOIN session_metrics sm ON sm.session_id = s.id
+WHERE s.player_id = :player_id
+  AND s.id != :exclude
+  AND sm.metric_id = :metric_id
+  AND COALESCE(sm.pitch_type, '') = :pitch_type
+  AND (:period = 'all' OR substr(s.date, 1, length(:period)) = :period)
+  AND {EFFECTIVE_ROWS}
+"""
+
+
+def periods_for(when) -> list:
+    return ["all", when.strftime("%Y"), when.strftime("%Y-%m"), when.strftime("%Y-%m-%d")]
+
+
+def _session_aggregates(db: Session, session_ids):
+    stmt = text(_SESSION_AGGREGATE_SQL).bindparams(bindparam("session_ids", expanding=True))
+    return db.execute(stmt, {"session_ids": list(session_ids)}).all()
+
+
+def add_session(db: Session, session):
+    """Add a session's current metric values to its player's rollups. Flushes, does not commit."""
+    add_sessions(db, [session])
+
+
+def add_sessions(db: Session, sessions):
+    """add_session() for many sessions with one aggregate query and one batched upsert."""
+    db.flush()
+    by_id = {s.id: s for s in sessions}
+    if not by_id:
+        return
+    rows = [
+        {
+            "player_id": by_id[session_id].player_id,
+            "metric_id": metric_id,
+            "pitch_type": pitch_type,
+            "period": period,
+            "count": count,
+            "sum": total,
+            "sum_sq": total_sq,
+            "min": low,
+            "max": high,
+        }
+        for session_id, metric_id, pitch_type, count, total, total_sq, low, high
+        in _session_aggregates(db, by_id)
+        for period in periods_for(by_id[session_id].date)
+    ]
+    if not rows:
+        return
+
+    stmt = insert(MetricRollup)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["player_id", "metric_id", "pitch_type", "period"],
+            set_={
+                "count": MetricRollup.count + stmt.excluded.count,
+                "sum": MetricRollup.sum + stmt.excluded.sum,
+                "sum_sq": MetricRollup.sum_sq + stmt.excluded.sum_sq,
+                "min": text("min(metric_rollups.min, excluded.min)"),
+                "max": text("max(metric_rollups.max, excluded.max)"),
+            },
+        ),
+        rows,
+    )
+
+
+def remove_session(db: Session, session):
+    """
+    Take a session's current metric values out of its player's rollups.
+    Call before the session's rows or date change. Flushes, does not commit.
+    """
+    db.flush()
+    stale = []
+    for _, metric_id, pitch_type, count, total, total_sq, low, high in _session_aggregates(db, [session.id]):
+        for period in periods_for(session.date):
+            key = {"player_id": session.player_id, "metric_id": metric_id,
+                   "pitch_type": pitch_type, "period": period}
+            left = db.execute(
+                text(_SUBTRACT_SQL), {**key, "count": count, "sum": total, "sum_sq": total_sq}
+            ).first()
+            if left is None:
+                continue
+            remaining, cell_min, cell_max = left
+            if remaining <= 0 or low <= cell_min or high >= cell_max:
+                stale.append(key)
+
+    for key in stale:
+        _recompute_cell(db, key, exclude_session_id=session.id)
+
+
+def _recompute_cell(db: Session, key: dict, exclude_session_id: int = -1):
+    count, total, total_sq, low, high = db.execute(
+        text(_CELL_SQL), {**key, "exclude": exclude_session_id}
+    ).one()
+    if not count:
+        db.execute(
+            text("DELETE FROM metric_rollups WHERE player_id = :player_id AND metric_id = :metric_id "
+                 "AND pitch_type = :pitch_type AND period = :period"),
+            key,
+        )
+        return
+    db.execute(
+        text("UPDATE metric_rollups SET count = :count, sum = :sum, sum_sq = :sum_sq, min = :min, max = :max "
+             "WHERE player_id = :player_id AND metric_id = :metric_id "
+             "AND pitch_type = :pitch_type AND period = :period"),
+        {**key, "count": count, "sum": total, "sum_sq": total_sq, "min": low, "max": high},
+    )
+
+
+def remove_player(db: Session, player_id: str):
+    db.execute(text("DELETE FROM metric_rollups WHERE player_id = :player_id"), {"player_id": player_id})
+
+
+def rebuild(db: Session) -> int:
+    """Recompute the whole table. Returns the number of rows written."""
+    db.execute(text("DELETE FROM metric_rollups"))
+    written = 0
+    for period in PERIOD_EXPRESSIONS:
+        result = db.execute(text(f"""
+            INSERT INTO metric_rollups (player_id, metric_id, pitch_type, period, count, sum, sum_sq, min, max)
+            SELECT s.player_id, sm.metric_id, COALESCE(sm.pitch_type, ''), {period},
+                   COUNT(*), SUM(sm.value), SUM(sm.value * sm.value), MIN(sm.value), MAX(sm.value)
+            FROM sessions s
+            JOIN session_metrics sm ON sm.session_id = s.id
+            WHERE {EFFECTIVE_ROWS}
+            GROUP BY s.player_id, sm.metric_id, COALESCE(sm.pitch_type, ''), {period}
+        """))
+        written += result.rowcount
+    return written
+
+
+def read(db: Session, player_id: str, period: str = "all", source: str = None, pitch_type: str = None) -> list:
+    """Precomputed cells for one player and period, with mean/std derived."""
+    filters, params = [], {"player_id": player_id, "period": period}
+    if source:
+        filters.append("AND d.source = :source")
+        params["source"] = source
+    if pitch_type:
+        filters.append("AND r.pitch_type = :pitch_type")
+        params["pitch_type"] = pitch_type
+
+    rows = db.execute(text(f"""
+        SELECT d.source, r.pitch_type, d.name, d.unit, r.count, r.sum, r.sum_sq, r.min, r.max
+        FROM metric_rollups r
+        JOIN metric_definitions d ON d.id = r.metric_id
+        WHERE r.player_id = :player_id AND r.period = :period
+        {' '.join(filters)}
+        ORDER BY d.source, r.pitch_type, d.name
+    """), params).all()
+
+    cells = []
+    for source, pitch_type, name, unit, count, total, total_sq, low, high in rows:
+        mean = total / count
+        variance = max(total_sq / count - mean * mean, 0.0)
+        cells.append({
+            "source": source,
+            "pitch_type": pitch_type or None,
+            "metric_name": name,
+            "unit": unit or None,
+            "count": count,
+            "mean": round(mean, 3),
+            "std": round(variance ** 0.5, 3),
+            "min": low,
+            "max": high,
+        })
+    return cells
@@ -0,0 +1,112 @@
+# app/services/metric_trends.py
+"""
+Time-bucketed trends for one player's metric.
+
+SQL does the filtering and bucketing: it returns (bucket, value) pairs for
+the player's sessions in the window, ordered by bucket. NumPy then computes
+per-bucket statistics over contiguous slices of that array: mean and std
+from cumulative sums, max with ``maximum.reduceat``, p90 per slice.
+
+With ``rolling`` > 1 every bucket's statistics cover that bucket and the
+preceding ``rolling - 1`` calendar buckets.
+
+Imported per-pitch rows are used where a session has them; sessions that
+only carry averaged values contribute those instead.
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.metric_rollups import EFFECTIVE_ROWS
+
+BUCKETS = {
+    "day": "date(s.date)",
+    "week": "date(s.date, 'weekday 0', '-6 days')",  # Monday
+    "month": "strftime('%Y-%m-01', s.date)",
+}
+
+_TREND_SQL = f"""
+SELECT {{bucket}} AS bucket, sm.value
+FROM sessions s
+JOIN session_metrics sm ON sm.session_id = s.id
+JOIN metric_definitions d ON d.id = sm.metric_id
+WHERE s.player_id = :player_id
+  AND s.date >= :since
+  AND d.name = :metric
+  {{filters}}
+  AND {EFFECTIVE_ROWS}
+ORDER BY bucket
+"""
+
+
+def _ordinal(bucket: str, size: str) -> int:
+    """Consecutive integers for consecutive buckets of the given size."""
+    day = date.fromisoformat(bucket)
+    if size == "month":
+        return day.year * 12 + day.month - 1
+    if size == "week":
+        return day.toordinal() // 7
+    return day.toordinal()
+
+
+def bucket_values(db: Session, player_id: str, metric: str, since: datetime, bucket: str,
+                  pitch_type: str = None, source: str = None):
+    """(bucket labels, offsets, values): bucket i owns values[offsets[i]:offsets[i + 1]]."""
+    filters, params = [], {"player_id": player_id, "metric": metric, "since": since.isoformat(" ")}
+    if pitch_type:
+        filters.append("AND sm.pitch_type = :pitch_type")
+        params["pitch_type"] = pitch_type
+    if source:
+        filters.append("AND d.source = :source")
+        params["source"] = source
+
+    sql = _TREND_SQL.format(bucket=BUCKETS[bucket], filters="\n  ".join(filters))
+    rows = db.execute(text(sql), params).all()
+    if not rows:
+        return [], np.zeros(1, dtype=np.int64), np.zeros(0)
+
+    labels = np.array([r[0] for r in rows])
+    values = np.fromiter((r[1] for r in rows), dtype=float, count=len(rows))
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    offsets = np.r_[starts, len(values)]
+    return labels[starts].tolist(), offsets, values
+
+
+def trends(db: Session, player_id: str, metric: str, window_days: int = 90, bucket: str = "week",
+           pitch_type: str = None, source: str = None, rolling: int = 1) -> list:
+    since = datetime.utcnow() - timedelta(days=window_days)
+    labels, offsets, values = bucket_values(db, player_id, metric, since, bucket, pitch_type, source)
+    if not labels:
+        return []
+
+    # Each bucket's rolling window starts at the first bucket no more than
+    # `rolling - 1` buckets earlier on the calendar.
+    ordinals = np.array([_ordinal(label, bucket) for label in labels])
+    first = np.searchsorted(ordinals, ordinals - (rolling - 1), side="left")
+    lo = offsets[first]
+    hi = offsets[1:]
+
+    csum = np.r_[0.0, np.cumsum(values)]
+    csq = np.r_[0.0, np.cumsum(values * values)]
+    count = hi - lo
+    mean = (csum[hi] - csum[lo]) / count
+    var = np.maximum((csq[hi] - csq[lo]) / count - mean * mean, 0.0)
+    std = np.sqrt(var)
+
+    bucket_max = np.maximum.reduceat(values, offsets[:-1])
+    running_max = np.array([bucket_max[f:i + 1].max() for i, f in enumerate(first)])
+    p90 = np.array([np.percentile(values[a:b], 90) for a, b in zip(lo, hi)])
+
+    return [
+        {
+            "bucket_start": label,
+            "count": int(count[i]),
+            "mean": round(float(mean[i]), 3),
+            "max": round(float(running_max[i]), 3),
+            "p90": round(float(p90[i]), 3),
+            "std": round(float(std[i]), 3),
+        }
+        for i, label in enumerate(labels)
+    ]
@@ -0,0 +1,250 @@
+# app/services/pitch_arsenal.py
+"""
+Pitch arsenal analysis over a player's imported per-pitch metrics.
+
+One query loads the pitch rows (pitch_no set) for the movement, spin and
+release metrics in the date range. They are pivoted into a pitches x
+features matrix (NaN where a pitch lacks a value), and every statistic is
+computed with NumPy on per-pitch-type slices of it:
+
+- centroid: mean velocity, VB, HB and spin, circular mean of the spin axis
+- movement ellipse: covariance of (HB, VB) and its 95% ellipse
+- release: mean and spread of release height/side, with the same ellipse
+- separation: for every pair of pitch types, the distance between movement
+  centroids (inches and in pooled standard deviations) and the velocity,
+  spin and spin axis gaps
+
+Results are served through ``response_cache`` under a per-player namespace;
+routes that change a player's sessions call ``invalidate`` in the same
+transaction.
+"""
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.orm import Session
+
+from app.services import response_cache
+from app.services.session_import import axis_to_clock
+
+# feature -> stored metric name
+FEATURES = {
+    "velocity": "Velocity",
+    "vb": "VB (spin)",
+    "hb": "HB (trajectory)",
+    "spin": "Total Spin",
+    "spin_axis": "Spin Axis",
+    "release_height": "Release Height",
+    "release_side": "Release Side",
+}
+_COLUMN = {name: i for i, name in enumerate(FEATURES.values())}
+_FEATURE_INDEX = {feature: i for i, feature in enumerate(FEATURES)}
+
+# Squared Mahalanobis radius enclosing 95% of a bivariate normal (chi-square, 2 dof)
+ELLIPSE_95 = 5.991
+MIN_ELLIPSE_PITCHES = 3
+
+_PITCHES_SQL = """
+SELECT sm.session_id, d.source, sm.pitch_no, COALESCE(sm.pitch_type, ''), d.name, sm.value
+FROM sessions s
+JOIN session_metrics sm ON sm.session_id = s.id
+JOIN metric_definitions d ON d.id = sm.metric_id
+WHERE s.player_id = :player_id
+  AND sm.pitch_no IS NOT NULL
+  AND sm.value IS NOT NULL
+  AND d.name IN :names
+  {filters}
+"""
+
+
+def cache_namespace(player_id: str) -> str:
+    return f"arsenal:{player_id}"
+
+
+def invalidate(db: Session, player_id: str):
+    """Drop cached arsenals of a player. Call before db.commit()."""
+    response_cache.bump(db, cache_namespace(player_id))
+
+
+def load_pitches(db: Session, player_id: str, start: date = None, end: date = None, source: str = None):
+    """(pitch types, matrix): one row per pitch, one column per FEATURES entry."""
+    filters, params = [], {"player_id": player_id, "names": list(FEATURES.values())}
+    binds = [bindparam("names", expanding=True)]
+    if start:
+        filters.append("AND s.date >= :start")
+        params["start"] = datetime.combine(start, time.min)
+        binds.append(bindparam("start", type_=DateTime))
+    if end:
+        filters.append("AND s.date < :end")
+        params["end"] = datetime.combine(end + timedelta(days=1), time.min)
+        binds.append(bindparam("end", type_=DateTime))
+    if source:
+        filters.append("AND d.source = :source")
+        params["source"] = source
+
+    sql = _PITCHES_SQL.format(filters="\n  ".join(filters))
+    rows = db.execute(text(sql).bindparams(*binds), params).all()
+
+    pitches, pitch_types = {}, []
+    index = np.empty(len(rows), dtype=np.int64)
+    for i, (session_id, row_source, pitch_no, pitch_type, _, _) in enumerate(rows):
+        key = (session_id, row_source, pitch_no)
+        if key not in pitches:
+            pitches[key] = len(pitches)
+            pitch_types.append(pitch_type or "Unknown")
+        index[i] = pitches[key]
+
+    matrix = np.full((len(pitches), len(FEATURES)), np.nan)
+    columns = np.fromiter((_COLUMN[r[4]] for r in rows), dtype=np.int64, count=len(rows))
+    matrix[index, columns] = np.fromiter((r[5] for r in rows), dtype=float, count=len(rows))
+    return np.array(pitch_types, dtype=object), matrix
+
+
+# -------------------------------
+# Statistics
+# -------------------------------
+def _value(x, places=2):
+    return None if x is None or not np.isfinite(x) else round(float(x), places)
+
+
+def _nanmean(column):
+    finite = column[np.isfinite(column)]
+    return finite.mean() if finite.size else np.nan
+
+
+def _circular_mean(degrees):
+    finite = np.radians(degrees[np.isfinite(degrees)])
+    if not finite.size:
+        return np.nan
+    return np.degrees(np.arctan2(np.sin(finite).mean(), np.cos(finite).mean())) % 360
+
+
+def _axis_gap(a, b):
+    return np.abs((a - b + 180) % 360 - 180)
+
+
+def _covariance(points):
+    """Covariance of the complete (finite) rows of an n x 2 array, or None."""
+    points = points[np.isfinite(points).all(axis=1)]
+    if len(points) < MIN_ELLIPSE_PITCHES:
+        return None, len(points)
+    return np.cov(points, rowvar=False), len(points)
+
+
+def _ellipse(cov):
+    """95% ellipse of a 2x2 covariance: semi-axes and the major axis angle from the x axis."""
+    eigenvalues, eigenvectors = np.linalg.eigh(cov)
+    eigenvalues = np.maximum(eigenvalues, 0.0)
+    major = eigenvectors[:, 1]
+    return {
+        "semi_major": _value(np.sqrt(ELLIPSE_95 * eigenvalues[1])),
+        "semi_minor": _value(np.sqrt(ELLIPSE_95 * eigenvalues[0])),
+        "angle": _value(np.degrees(np.arctan2(major[1], major[0])) % 180, 1),
+        "covariance": [[_value(v, 3) for v in row] for row in cov],
+    }
+
+
+def _release(matrix):
+    h, s = _FEATURE_INDEX["release_height"], _FEATURE_INDEX["release_side"]
+    points = matrix[:, [s, h]]
+    points = points[np.isfinite(points).all(axis=1)]
+    if not len(points):
+        return None
+    cov, _ = _covariance(points)
+    std = points.std(axis=0, ddof=1) if len(points) > 1 else np.full(2, np.nan)
+    return {
+        "count": len(points),
+        "side": _value(points[:, 0].mean()),
+        "height": _value(points[:, 1].mean()),
+        "side_std": _value(std[0], 3),
+        "height_std": _value(std[1], 3),
+        "ellipse": _ellipse(cov) if cov is not None else None,
+    }
+
+
+def _centroid(matrix):
+    column = lambda feature: _nanmean(matrix[:, _FEATURE_INDEX[feature]])
+    centroid = {
+        "velocity": _value(column("velocity"), 1),
+        "vb": _value(column("vb"), 1),
+        "hb": _value(column("hb"), 1),
+        "spin": _value(column("spin"), 0),
+    }
+    axis = _circular_mean(matrix[:, _FEATURE_INDEX["spin_axis"]])
+    centroid["spin_axis"] = _value(axis, 1)
+    centroid["spin_direction"] = axis_to_clock(axis) if np.isfinite(axis) else None
+    return centroid, axis
+
+
+def _separation(names, centers, covariances, counts, velocity, spin, axis):
+    """Pairwise gaps between pitch types, computed on k x k arrays."""
+    gap = centers[:, None, :] - centers[None, :, :]
+    distance = np.sqrt((gap ** 2).sum(axis=-1))
+    velocity_gap = np.abs(velocity[:, None] - velocity[None, :])
+    spin_gap = np.abs(spin[:, None] - spin[None, :])
+    axis_gap = _axis_gap(axis[:, None], axis[None, :])
+
+    pairs = []
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            standardized = None
+            if covariances[i] is not None and covariances[j] is not None:
+                # Mahalanobis distance between the centroids under the pooled covariance
+                pooled = ((counts[i] - 1) * covariances[i] + (counts[j] - 1) * covariances[j]) / (counts[i] + counts[j] - 2)
+                try:
+                    standardized = float(np.sqrt(gap[i, j] @ np.linalg.solve(pooled, gap[i, j])))
+                except np.linalg.LinAlgError:
+                    standardized = None
+            pairs.append({
+                "a": names[i],
+                "b": names[j],
+                "movement": _value(distance[i, j]),
+                "movement_sd": _value(standardized),
+                "velocity": _value(velocity_gap[i, j], 1),
+                "spin": _value(spin_gap[i, j], 0),
+                "spin_axis": _value(axis_gap[i, j], 1),
+            })
+    return pairs
+
+
+def analyze(db: Session, player_id: str, start: date = None, end: date = None, source: str = None) -> dict:
+    pitch_types, matrix = load_pitches(db, player_id, start, end, source)
+    total = len(pitch_types)
+
+    movement = [_FEATURE_INDEX["hb"], _FEATURE_INDEX["vb"]]
+    names, summaries = [], []
+    centers, covariances, counts, velocity, spin, axis = [], [], [], [], [], []
+    for name in sorted(set(pitch_types)):
+        rows = matrix[pitch_types == name]
+        centroid, mean_axis = _centroid(rows)
+        cov, complete = _covariance(rows[:, movement])
+
+        names.append(name)
+        centers.append([_nanmean(rows[:, movement[0]]), _nanmean(rows[:, movement[1]])])
+        covariances.append(cov)
+        counts.append(complete)
+        velocity.append(_nanmean(rows[:, _FEATURE_INDEX["velocity"]]))
+        spin.append(_nanmean(rows[:, _FEATURE_INDEX["spin"]]))
+        axis.append(mean_axis)
+        summaries.append({
+            "pitch_type": name,
+            "count": len(rows),
+            "usage": _value(100.0 * len(rows) / total, 1),
+            "centroid": centroid,
+            "movement_ellipse": _ellipse(cov) if cov is not None else None,
+            "release": _release(rows),
+        })
+
+    separation = []
+    if len(names) > 1:
+        separation = _separation(
+            names, np.array(centers), covariances, counts,
+            np.array(velocity), np.array(spin), np.array(axis)
+        )
+
+    return {
+        "pitches": total,
+        "pitch_types": summaries,
+        "separation": separation,
+        "release": _release(matrix),
+    }
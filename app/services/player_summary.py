@@ -0,0 +1,92 @@
+# app/services/player_summary.py
+"""
+Maintenance of the ``player_summary`` table.
+
+Routers that change a player's sessions, drill assignments or notes call
+``refresh(db, player_id)`` before committing. It recomputes that one
+player's row from indexed aggregates (sessions by player_id, player_drills
+by its primary key), so the cost depends on the player's own history, not
+on the size of the tables. ``rebuild(db)`` recomputes every row in a single
+INSERT ... SELECT.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.models.player import Player
+from app.models.player_drill import PlayerDrill
+from app.models.player_summary import PlayerSummary
+from app.models.session import Session as BaseballSession
+
+
+def refresh(db: Session, player_id: str):
+    """Recompute one player's summary row. Flushes, does not commit."""
+    db.flush()
+
+    drill_count = (
+        db.query(func.count())
+        .select_from(PlayerDrill)
+        .filter(PlayerDrill.player_id == player_id)
+        .scalar()
+    )
+    by_type = (
+        db.query(BaseballSession.session_type, func.count(), func.max(BaseballSession.date))
+        .filter(BaseballSession.player_id == player_id)
+        .group_by(BaseballSession.session_type)
+        .all()
+    )
+    notes_updated_at = db.query(Player.notes_updated_at).filter(Player.id == player_id).scalar()
+
+    values = {
+        "drill_count": drill_count,
+        "session_count": sum(count for _, count, _ in by_type),
+        "last_session_date": max((last for _, _, last in by_type if last), default=None),
+        "session_type_counts_json": json.dumps({stype: count for stype, count, _ in by_type}),
+        "notes_updated_at": notes_updated_at,
+        "updated_at": datetime.utcnow(),
+    }
+    stmt = insert(PlayerSummary).values(player_id=player_id, **values)
+    db.execute(stmt.on_conflict_do_update(index_elements=[PlayerSummary.player_id], set_=values))
+
+    # Keep an already-loaded summary object in step with the new row
+    loaded = db.identity_map.get(db.identity_key(PlayerSummary, player_id))
+    if loaded is not None:
+        db.expire(loaded)
+
+
+def rebuild(db: Session) -> int:
+    """Recompute the whole table. Returns the number of rows written."""
+    db.execute(text("DELETE FROM player_summary"))
+    result = db.execute(text("""
+        INSERT INTO player_summary (
+            player_id, drill_count, session_count, last_session_date,
+            session_type_counts_json, notes_updated_at, updated_at
+        )
+        SELECT p.id,
+               COALESCE(d.n, 0),
+               COALESCE(s.n, 0),
+               s.last_date,
+               COALESCE(s.by_type, '{}'),
+               p.notes_updated_at,
+               :now
+        FROM players p
+        LEFT JOIN (
+            SELECT player_id, COUNT(*) AS n FROM player_drills GROUP BY player_id
+        ) d ON d.player_id = p.id
+        LEFT JOIN (
+            SELECT player_id,
+                   SUM(n) AS n,
+                   MAX(last_date) AS last_date,
+                   json_group_object(session_type, n) AS by_type
+            FROM (
+                SELECT player_id, session_type, COUNT(*) AS n, MAX(date) AS last_date
+                FROM sessions
+                GROUP BY player_id, session_type
+            )
+            GROUP BY player_id
+        ) s ON s.player_id = p.id
+    """), {"now": datetime.utcnow()})
+    return result.rowcount
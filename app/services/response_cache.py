@@ -0,0 +1,120 @@
+# app/services/response_cache.py
+"""
+Versioned response cache for read-mostly endpoints.
+
+Each cached namespace (e.g. "encyclopedia") has a version counter in the
+``content_versions`` table. Write routes call ``bump()`` inside their
+transaction; read routes go through ``cached_json_response()``, which keys
+the serialized body by (namespace, version, path, query). A bump therefore
+invalidates every cached response of that namespace at once, and because the
+counter lives in the database every worker process sees it.
+
+Responses carry a strong ETag (hash of the body) and ``If-None-Match`` is
+answered with 304.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple, Any
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.models.content_version import ContentVersion
+
+ENCYCLOPEDIA = "encyclopedia"
+MAX_ENTRIES = 512
+
+
+class _LRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_cache = _LRU(MAX_ENTRIES)
+
+
+def current_version(db: Session, namespace: str = ENCYCLOPEDIA) -> int:
+    version = (
+        db.query(ContentVersion.version)
+        .filter(ContentVersion.name == namespace)
+        .scalar()
+    )
+    return version or 0
+
+
+def bump(db: Session, namespace: str = ENCYCLOPEDIA):
+    """Invalidate a namespace. Call before db.commit() so it shares the write's transaction."""
+    stmt = insert(ContentVersion).values(name=namespace, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ContentVersion.name],
+        set_={"version": ContentVersion.version + 1},
+    )
+    db.execute(stmt)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison is allowed for If-None-Match (RFC 9110 13.1.2)
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def cached_json_response(
+        request: Request,
+        db: Session,
+        build: Callable[[], Tuple[Any, Dict[str, str]]],
+        namespace: str = ENCYCLOPEDIA,
+) -> Response:
+    """
+    Serve `build()` from the cache when the namespace version is unchanged.
+    `build` returns (payload, extra_headers); exceptions it raises are not cached.
+    """
+    # Read the version *before* building, so a concurrent write can only make
+    # the stored body newer than its key, never older.
+    version = current_version(db, namespace)
+    key = (namespace, version, request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+    entry = _cache.get(key)
+    if entry is None:
+        payload, extra_headers = build()
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        entry = (body, etag, extra_headers)
+        _cache.put(key, entry)
+
+    body, etag, extra_headers = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache", **extra_headers}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def clear():
+    _cache.clear()
@@ -0,0 +1,184 @@
+# app/services/search_index.py
+"""
+SQLite FTS5 index over the encyclopedia (concepts + drills).
+
+The index lives in a single virtual table, ``encyclopedia_fts``. Routers keep
+it in sync by calling ``index_concept`` / ``index_drill`` / ``remove_entry``
+inside the same transaction as the row change, so a rollback also rolls back
+the index update.
+
+FTS5 can only look rows up by rowid (entry_id is UNINDEXED), so
+``encyclopedia_fts_rowids`` maps each entry id to its rowid and updates and
+deletes go through it instead of scanning the index.
+"""
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.concept import Concept
+from app.models.drill import Drill
+
+FTS_TABLE = "encyclopedia_fts"
+ROWID_TABLE = "encyclopedia_fts_rowids"
+
+# bm25 weights, in column order: entry_id, entry_type, category, title, body, tags
+BM25_WEIGHTS = "0.0, 0.0, 0.0, 10.0, 1.0, 5.0"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def ensure_search_index(conn) -> bool:
+    """
+    Create the FTS table and its rowid map if either is missing.
+    Returns True when anything was created (and therefore needs a rebuild).
+    """
+    existing = set(conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (:fts, :rowids)"),
+        {"fts": FTS_TABLE, "rowids": ROWID_TABLE},
+    ).scalars())
+    if existing == {FTS_TABLE, ROWID_TABLE}:
+        return False
+
+    if ROWID_TABLE not in existing:
+        conn.execute(text(f"CREATE TABLE {ROWID_TABLE} (entry_id TEXT PRIMARY KEY, fts_rowid INTEGER NOT NULL)"))
+    if FTS_TABLE in existing:
+        return True
+
+    conn.execute(text(f"""
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            entry_id UNINDEXED,
+            entry_type UNINDEXED,
+            category UNINDEXED,
+            title,
+            body,
+            tags,
+            tokenize = 'porter unicode61 remove_diacritics 2'
+        )
+    """))
+    return True
+
+
+def _rowid(db: Session, entry_id: str) -> Optional[int]:
+    return db.execute(
+        text(f"SELECT fts_rowid FROM {ROWID_TABLE} WHERE entry_id = :id"), {"id": entry_id}
+    ).scalar()
+
+
+def _upsert(db: Session, entry_id: str, entry_type: str, category: Optional[str],
+            title: str, body: str, tags: List[str]):
+    rowid = _rowid(db, entry_id)
+    if rowid is not None:
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": rowid})
+    result = db.execute(
+        text(f"""
+            INSERT INTO {FTS_TABLE} (rowid, entry_id, entry_type, category, title, body, tags)
+            VALUES (:rowid, :id, :type, :category, :title, :body, :tags)
+        """),
+        {
+            "rowid": rowid,
+            "id": entry_id,
+            "type": entry_type,
+            "category": category or "",
+            "title": title or "",
+            "body": body or "",
+            "tags": " ".join(tags),
+        },
+    )
+    if rowid is None:
+        db.execute(
+            text(f"INSERT INTO {ROWID_TABLE} (entry_id, fts_rowid) VALUES (:id, :rowid)"),
+            {"id": entry_id, "rowid": result.lastrowid},
+        )
+
+
+def index_concept(db: Session, concept: Concept):
+    body = "\n".join(part for part in (concept.summary, concept.body) if part)
+    _upsert(db, concept.id, "concept", concept.category, concept.title, body,
+            [t.name for t in concept.tags])
+
+
+def index_drill(db: Session, drill: Drill):
+    _upsert(db, drill.id, "drill", drill.category, drill.title, drill.description,
+            [t.name for t in drill.tags])
+
+
+def remove_entry(db: Session, entry_id: str):
+    rowid = _rowid(db, entry_id)
+    if rowid is not None:
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": rowid})
+        db.execute(text(f"DELETE FROM {ROWID_TABLE} WHERE entry_id = :id"), {"id": entry_id})
+
+
+def rebuild(db: Session) -> int:
+    """Re-index every concept and drill. Returns the number of indexed entries."""
+    db.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    db.execute(text(f"DELETE FROM {ROWID_TABLE}"))
+    count = 0
+    for concept in db.query(Concept).yield_per(500):
+        index_concept(db, concept)
+        count += 1
+    for drill in db.query(Drill).yield_per(500):
+        index_drill(db, drill)
+        count += 1
+    db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+    return count
+
+
+def build_match_query(raw: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+    Every word becomes a quoted prefix term, so "pitch tun" matches "pitching tunnel".
+    """
+    words = _WORD_RE.findall(raw or "")
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def search(db: Session, query: Optional[str], category: Optional[str] = None,
+           tags: Optional[List[str]] = None, limit: int = 50, offset: int = 0):
+    """
+    Run a ranked search and return rows of
+    (entry_id, entry_type, score, snippet) ordered best-first.
+    """
+    params = {"limit": limit, "offset": offset}
+    where = []
+
+    match = build_match_query(query)
+    if match:
+        where.append(f"{FTS_TABLE} MATCH :match")
+        params["match"] = match
+        score = f"bm25({FTS_TABLE}, {BM25_WEIGHTS})"
+        snippet = f"snippet({FTS_TABLE}, -1, '<mark>', '</mark>', '…', 12)"
+        order = "score"
+    else:
+        score = "0.0"
+        snippet = "''"
+        order = "title"
+
+    if category:
+        where.append("category LIKE :category")
+        params["category"] = f"{category}%"
+
+    if tags:
+        tag_params = {f"tag_{i}": name for i, name in enumerate(tags)}
+        tag_list = ", ".join(f":{key}" for key in tag_params)
+        where.append(f"""entry_id IN (
+            SELECT ct.concept_id FROM concept_tags ct JOIN tags t ON t.id = ct.tag_id
+            WHERE t.name IN ({tag_list})
+            UNION
+            SELECT dt.drill_id FROM drill_tags dt JOIN tags t ON t.id = dt.tag_id
+            WHERE t.name IN ({tag_list})
+        )""")
+        params.update(tag_params)
+
+    sql = f"""
+        SELECT entry_id, entry_type, {score} AS score, {snippet} AS snippet
+        FROM {FTS_TABLE}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {order}
+        LIMIT :limit OFFSET :offset
+    """
+    return db.execute(text(sql), params).all()
@@ -0,0 +1,144 @@
+# app/services/session_compare.py
+"""
+Side-by-side comparison of two sessions, or of a session against the
+player's recent baseline.
+
+Session-level numeric values (pitch_no NULL) are aligned by metric
+definition (source, name, unit) and pitch type. SQL loads the values of the
+compared sessions and the player's earlier sessions once; every key is
+mapped to a column index and NumPy reduces the arrays with ``bincount``:
+per-key values for each side, baseline means, and history mean/std for the
+z-scores. Text-only values (e.g. spin direction as a clock face) are skipped.
+
+History is every session of session A's player dated before A.
+"""
+import numpy as np
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.orm import Session
+
+_SESSION_VALUES_SQL = """
+SELECT sm.session_id, sm.metric_id, COALESCE(sm.pitch_type, ''), sm.value
+FROM session_metrics sm
+WHERE sm.session_id IN :session_ids
+  AND sm.pitch_no IS NULL
+  AND sm.value IS NOT NULL
+"""
+
+_HISTORY_SQL = """
+SELECT s.id, sm.metric_id, COALESCE(sm.pitch_type, ''), sm.value
+FROM sessions s
+JOIN session_metrics sm ON sm.session_id = s.id
+WHERE s.player_id = :player_id
+  AND (s.date < :date OR (s.date = :date AND s.id < :session_id))
+  AND sm.metric_id IN :metric_ids
+  AND sm.pitch_no IS NULL
+  AND sm.value IS NOT NULL
+ORDER BY s.date DESC, s.id DESC
+"""
+
+_DEFINITIONS_SQL = "SELECT id, source, name, unit FROM metric_definitions WHERE id IN :metric_ids"
+
+# A std below this fraction of |mean| is rounding noise, not spread
+SPREAD_TOLERANCE = 1e-9
+COLUMNS = ["source", "pitch_type", "metric_name", "unit", "a", "b", "delta", "pct_change", "z_a", "z_b"]
+
+
+def _means(codes, values, size):
+    """Per-key mean of `values` (NaN where a key has no values)."""
+    counts = np.bincount(codes, minlength=size)
+    sums = np.bincount(codes, weights=values, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def _round(array):
+    return [None if np.isnan(v) else round(float(v), 3) for v in array]
+
+
+def compare(db: Session, a, b=None, baseline_n: int = None) -> dict:
+    """
+    Compare session `a` with session `b`, or with the mean of the player's
+    `baseline_n` sessions before `a`.
+
+    Returns {"columns", "rows", "baseline_sessions"}; rows are aligned on
+    the union of both sides' keys, with None where a side has no value.
+    """
+    session_ids = [a.id] + ([b.id] if b is not None else [])
+    rows = db.execute(
+        text(_SESSION_VALUES_SQL).bindparams(bindparam("session_ids", expanding=True)),
+        {"session_ids": session_ids}
+    ).all()
+
+    keys = {}
+    for _, metric_id, pitch_type, _ in rows:
+        keys.setdefault((metric_id, pitch_type), len(keys))
+    if not keys:
+        return {"columns": COLUMNS, "rows": [], "baseline_sessions": []}
+    metric_ids = sorted({metric_id for metric_id, _ in keys})
+
+    history = db.execute(
+        # Typed so the bound date is formatted exactly like the stored column
+        text(_HISTORY_SQL).bindparams(bindparam("metric_ids", expanding=True), bindparam("date", type_=DateTime)),
+        {
+            "player_id": a.player_id,
+            "date": a.date,
+            "session_id": a.id,
+            "metric_ids": metric_ids,
+        }
+    ).all()
+
+    size = len(keys)
+    codes = np.fromiter((keys[(r[1], r[2])] for r in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((r[3] for r in rows), dtype=float, count=len(rows))
+    owners = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+
+    # History rows whose pitch type is not on either side get code -1 and are dropped
+    h_codes = np.fromiter((keys.get((r[1], r[2]), -1) for r in history), dtype=np.int64, count=len(history))
+    h_values = np.fromiter((r[3] for r in history), dtype=float, count=len(history))
+    h_sessions = np.fromiter((r[0] for r in history), dtype=np.int64, count=len(history))
+    known = h_codes >= 0
+    h_codes, h_values, h_sessions = h_codes[known], h_values[known], h_sessions[known]
+
+    side_a = owners == a.id
+    value_a = _means(codes[side_a], values[side_a], size)
+
+    baseline_sessions = []
+    if b is not None:
+        side_b = owners == b.id
+        value_b = _means(codes[side_b], values[side_b], size)
+    else:
+        # History is ordered newest first, so the baseline is the first n distinct sessions
+        _, first_seen = np.unique(h_sessions, return_index=True)
+        baseline_sessions = h_sessions[np.sort(first_seen)][:baseline_n].tolist()
+        in_baseline = np.isin(h_sessions, baseline_sessions)
+        value_b = _means(h_codes[in_baseline], h_values[in_baseline], size)
+
+    counts = np.bincount(h_codes, minlength=size)
+    mean = _means(h_codes, h_values, size)
+    # Two passes: sum_sq - n * mean**2 cancels to rounding noise when there is no spread
+    dev = h_values - mean[h_codes]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Sample std, undefined below two sessions or with no spread (relative to the mean)
+        var = np.bincount(h_codes, weights=dev * dev, minlength=size) / (counts - 1)
+        std = np.sqrt(var)
+        std = np.where((counts > 1) & (std > SPREAD_TOLERANCE * np.maximum(np.abs(mean), 1.0)), std, np.nan)
+        z_a = (value_a - mean) / std
+        z_b = (value_b - mean) / std
+        delta = value_a - value_b
+        pct_change = np.where(value_b != 0, 100.0 * delta / np.abs(value_b), np.nan)
+
+    definitions = {
+        row[0]: row[1:]
+        for row in db.execute(
+            text(_DEFINITIONS_SQL).bindparams(bindparam("metric_ids", expanding=True)),
+            {"metric_ids": metric_ids}
+        )
+    }
+    columns = [_round(column) for column in (value_a, value_b, delta, pct_change, z_a, z_b)]
+    table = []
+    for (metric_id, pitch_type), i in keys.items():
+        source, name, unit = definitions[metric_id]
+        table.append([source, pitch_type or None, name, unit or None] + [column[i] for column in columns])
+    table.sort(key=lambda row: (row[0], row[1] or "", row[2]))
+
+    return {"columns": COLUMNS, "rows": table, "baseline_sessions": baseline_sessions}
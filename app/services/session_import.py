@@ -0,0 +1,320 @@
+# app/services/session_import.py
+"""Streaming import of raw launch-monitor exports (Rapsodo, TrackMan) into session metrics.
+
+Each source is described by a column schema, the server-side counterpart of
+METRIC_MAP / PITCH_MAP in src/utils/sessionMetrics.js: which header holds the
+pitch type, which numeric columns to keep and under what metric name/unit.
+
+The file is read row by row. Every pitch is stored as its own set of metric
+rows (pitch_no set), and the per-pitch-type averages/maxima the session views
+show are stored alongside them (pitch_no NULL). Rows go in through executemany
+batches inside the caller's transaction.
+"""
+import csv
+import io
+import json
+import math
+from collections import defaultdict
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.metric_definition import MetricDefinition
+from app.models.session import SessionMetric
+from app.services import metric_dictionary
+
+BATCH_SIZE = 5000
+HEADER_SCAN_LINES = 50
+
+# Column schema per source:
+#   pitch_type  - header(s) holding the pitch type, first non-empty one wins
+#   pitch_no    - header(s) holding the pitch number (row ordinal if absent)
+#   columns     - header -> (metric_name, unit, decimals for the averages)
+#   spin_axis   - (header, "clock" | "deg"), stored per pitch as "Spin Axis" in degrees
+#   maxima      - metric_name -> name of the per-pitch-type max metric
+#   pitch_aliases - raw pitch type -> stored pitch type (None drops the value)
+SOURCE_SCHEMAS = {
+    "rapsodo": {
+        "pitch_type": ("Pitch Type",),
+        "pitch_no": ("No", "Pitch No", "Pitch ID"),
+        "columns": {
+            "Velocity": ("Velocity", "mph", 1),
+            "Total Spin": ("Total Spin", "rpm", 0),
+            "VB (spin)": ("VB (spin)", "in", 1),
+            "HB (trajectory)": ("HB (trajectory)", "in", 1),
+            "Spin Efficiency (release)": ("Spin Efficiency (release)", "%", 1),
+            "Gyro Degree (deg)": ("Gyro Degree (deg)", "deg", 1),
+            "Release Angle": ("Release Angle", "deg", 1),
+            "Horizontal Angle": ("Horizontal Angle", "deg", 1),
+            "Release Height": ("Release Height", "ft", 2),
+            "Release Side": ("Release Side", "ft", 2),
+        },
+        "spin_axis": ("Spin Direction", "clock"),
+        "maxima": {"Velocity": "Max Velocity", "Total Spin": "Max Total Spin"},
+        "pitch_aliases": {},
+    },
+    "trackman": {
+        "pitch_type": ("TaggedPitchType", "AutoPitchType"),
+        "pitch_no": ("PitchNo",),
+        "columns": {
+            "RelSpeed": ("Velocity", "mph", 1),
+            "SpinRate": ("Total Spin", "rpm", 0),
+            "InducedVertBreak": ("VB (spin)", "in", 1),
+            "HorzBreak": ("HB (trajectory)", "in", 1),
+            "VertRelAngle": ("Release Angle", "deg", 1),
+            "HorzRelAngle": ("Horizontal Angle", "deg", 1),
+            "RelHeight": ("Release Height", "ft", 2),
+            "RelSide": ("Release Side", "ft", 2),
+            "Extension": ("Extension", "ft", 2),
+            "VertApprAngle": ("Vertical Approach Angle", "deg", 1),
+        },
+        "spin_axis": ("SpinAxis", "deg"),
+        "maxima": {"Velocity": "Max Velocity", "Total Spin": "Max Total Spin"},
+        "pitch_aliases": {
+            "FourSeamFastBall": "Fastball",
+            "TwoSeamFastBall": "TwoSeamFastball",
+            "ChangeUp": "Changeup",
+            "Undefined": None,
+            "Other": None,
+        },
+    },
+}
+
+
+def register_source(name: str, schema: dict):
+    """Add or replace the column schema for an import source."""
+    SOURCE_SCHEMAS[name.lower()] = schema
+
+
+def get_schema(source: str, column_map: str = None) -> dict:
+    """Schema for `source`, with extra columns from a JSON `column_map` merged in.
+
+    column_map maps a header to a metric name, or to [metric_name, unit].
+    """
+    schema = SOURCE_SCHEMAS.get((source or "").lower())
+    if schema is None:
+        raise HTTPException(status_code=400, detail=f"Unknown import source '{source}'")
+    if not column_map:
+        return schema
+
+    try:
+        extra = json.loads(column_map)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="column_map must be a JSON object")
+    if not isinstance(extra, dict):
+        raise HTTPException(status_code=400, detail="column_map must be a JSON object")
+
+    columns = dict(schema["columns"])
+    for header, target in extra.items():
+        if isinstance(target, str):
+            columns[header] = (target, None, 1)
+        elif isinstance(target, list) and target and isinstance(target[0], str):
+            columns[header] = (target[0], target[1] if len(target) > 1 else None, 1)
+        else:
+            raise HTTPException(status_code=400, detail=f"Invalid column_map entry for '{header}'")
+    return {**schema, "columns": columns}
+
+
+# -------------------------------
+# Spin direction helpers
+# -------------------------------
+def clock_to_axis(value: str):
+    """Rapsodo "h:mm" spin direction -> spin axis in degrees (12:00 = 180, pure backspin)."""
+    try:
+        hours, minutes = value.split(":", 1)
+        clock = int(hours) % 12 + int(minutes) / 60
+    except ValueError:
+        return None
+    return (clock * 30 + 180) % 360
+
+
+def axis_to_clock(axis: float) -> str:
+    clock = ((axis - 180) % 360) / 30
+    total_minutes = round(clock * 60) % 720
+    hours, minutes = divmod(total_minutes, 60)
+    return f"{hours or 12}:{minutes:02d}"
+
+
+def _to_float(value: str):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+# -------------------------------
+# Parsing
+# -------------------------------
+def _find_header(text, schema: dict):
+    """Skip any preamble lines and return (header cells, delimiter)."""
+    wanted = set(schema["pitch_type"])
+    for _ in range(HEADER_SCAN_LINES):
+        line = text.readline()
+        if not line:
+            break
+        delimiter = "\t" if "\t" in line else ","
+        cells = [cell.strip() for cell in next(csv.reader([line], delimiter=delimiter), [])]
+        if wanted.intersection(cells):
+            return cells, delimiter
+    raise HTTPException(
+        status_code=400,
+        detail=f"No header row with a {' / '.join(schema['pitch_type'])} column found"
+    )
+
+
+def _pitch_type(row, indexes, aliases):
+    for i in indexes:
+        if i < len(row):
+            value = row[i].strip()
+            if value in aliases:
+                value = aliases[value]
+            if value:
+                return value
+    return "Unknown"
+
+
+def import_csv(db: Session, session_id: int, source: str, stream, column_map: str = None,
+               replace: bool = True) -> dict:
+    """Import a raw export from a binary `stream` into session `session_id`.
+
+    With `replace`, metrics previously stored for this session and source are
+    removed first. Does not commit.
+    """
+    schema = get_schema(source, column_map)
+    source = source.lower()
+
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        header, delimiter = _find_header(text, schema)
+        position = {name: i for i, name in enumerate(header)}
+
+        type_indexes = [position[h] for h in schema["pitch_type"] if h in position]
+        number_index = next((position[h] for h in schema["pitch_no"] if h in position), None)
+        axis_header, axis_format = schema.get("spin_axis") or (None, None)
+        axis_index = position.get(axis_header)
+        aliases = schema.get("pitch_aliases", {})
+        metric_ids = _resolve_metric_ids(db, source, schema)
+        metric_columns = [
+            (position[h], name, metric_ids[name]) for h, (name, _, _) in schema["columns"].items()
+            if h in position
+        ]
+        axis_id = metric_ids["Spin Axis"]
+
+        if replace:
+            db.query(SessionMetric).filter(
+                SessionMetric.session_id == session_id,
+                SessionMetric.metric_id.in_(
+                    db.query(MetricDefinition.id).filter(MetricDefinition.source == source)
+                )
+            ).delete(synchronize_session=False)
+
+        # per (pitch_type, metric_name): [count, sum, max]
+        totals = defaultdict(lambda: [0, 0.0, -math.inf])
+        # per pitch_type: [sin sum, cos sum] of the spin axis
+        axis_totals = defaultdict(lambda: [0.0, 0.0])
+        pitch_counts = defaultdict(int)
+        batch = []
+        rows_written = 0
+
+        def flush():
+            nonlocal batch, rows_written
+            if batch:
+                db.execute(insert(SessionMetric.__table__), batch)
+                rows_written += len(batch)
+                batch = []
+
+        for ordinal, row in enumerate(csv.reader(text, delimiter=delimiter), start=1):
+            if not any(cell.strip() for cell in row):
+                continue
+            pitch_type = _pitch_type(row, type_indexes, aliases)
+            pitch_no = ordinal
+            if number_index is not None and number_index < len(row):
+                pitch_no = int(_to_float(row[number_index]) or ordinal)
+            pitch_counts[pitch_type] += 1
+
+            for index, name, metric_id in metric_columns:
+                value = _to_float(row[index]) if index < len(row) else None
+                if value is None:
+                    continue
+                batch.append({
+                    "session_id": session_id,
+                    "metric_id": metric_id,
+                    "pitch_type": pitch_type,
+                    "pitch_no": pitch_no,
+                    "value": value,
+                    "value_text": None,
+                })
+                total = totals[(pitch_type, name)]
+                total[0] += 1
+                total[1] += value
+                if value > total[2]:
+                    total[2] = value
+
+            if axis_index is not None and axis_index < len(row):
+                raw = row[axis_index].strip()
+                axis = clock_to_axis(raw) if axis_format == "clock" else _to_float(raw)
+                if axis is not None:
+                    batch.append({
+                        "session_id": session_id,
+                        "metric_id": axis_id,
+                        "pitch_type": pitch_type,
+                        "pitch_no": pitch_no,
+                        "value": round(axis, 1),
+                        "value_text": None,
+                    })
+                    radians = math.radians(axis)
+                    axis_totals[pitch_type][0] += math.sin(radians)
+                    axis_totals[pitch_type][1] += math.cos(radians)
+
+            if len(batch) >= BATCH_SIZE:
+                flush()
+    finally:
+        text.detach()
+
+    # Per-pitch-type summary rows, in the shape the session views already read
+    decimals = {name: places for name, _, places in schema["columns"].values()}
+    maxima = schema.get("maxima", {})
+    for (pitch_type, name), (count, total, highest) in totals.items():
+        places = decimals.get(name, 1)
+        batch.append(_summary_row(session_id, metric_ids[name], pitch_type, round(total / count, places)))
+        if name in maxima:
+            batch.append(_summary_row(session_id, metric_ids[maxima[name]], pitch_type, round(highest, places)))
+    for pitch_type, (sin_sum, cos_sum) in axis_totals.items():
+        mean_axis = math.degrees(math.atan2(sin_sum, cos_sum)) % 360
+        batch.append(_summary_row(session_id, metric_ids["Spin Direction"], pitch_type,
+                                  text=axis_to_clock(mean_axis)))
+    for pitch_type, count in pitch_counts.items():
+        batch.append(_summary_row(session_id, metric_ids["Pitch Count"], pitch_type, count))
+    flush()
+
+    return {
+        "source": source,
+        "pitches": sum(pitch_counts.values()),
+        "pitch_types": dict(pitch_counts),
+        "rows": rows_written,
+    }
+
+
+def _resolve_metric_ids(db: Session, source: str, schema: dict) -> dict:
+    """metric name -> MetricDefinition id for every metric this schema can write."""
+    units = {name: unit for name, unit, _ in schema["columns"].values()}
+    for name, max_name in schema.get("maxima", {}).items():
+        units[max_name] = units.get(name)
+    units.update({"Spin Axis": "deg", "Spin Direction": "clock", "Pitch Count": None})
+
+    keys = {name: metric_dictionary.make_key(source, name, unit) for name, unit in units.items()}
+    ids = metric_dictionary.resolve(db, keys.values())
+    return {name: ids[key] for name, key in keys.items()}
+
+
+def _summary_row(session_id, metric_id, pitch_type, value=None, text=None):
+    return {
+        "session_id": session_id,
+        "metric_id": metric_id,
+        "pitch_type": pitch_type,
+        "pitch_no": None,
+        "value": value,
+        "value_text": text,
+    }
@@ -0,0 +1,105 @@
+# app/services/tags.py
+"""
+Bulk tag resolution shared by the concept and drill routers.
+
+``resolve_tags(db, names)`` turns a list of tag names into Tag rows with at
+most three statements: one ``IN`` lookup, one batched
+``INSERT ... ON CONFLICT(name) DO NOTHING`` for the missing names, and one
+lookup to pick up their ids. Names already seen by this process are served
+from a name -> id cache without touching the database.
+
+Ids created inside a transaction only enter the cache once that transaction
+commits, so a rollback can never leave an id in the cache that does not
+exist in the table.
+"""
+import threading
+import uuid
+from typing import Dict, Iterable, List
+
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.models.tag import Tag
+
+_PENDING_KEY = "pending_tag_ids"
+
+_cache: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def normalize_names(names: Iterable[str]) -> List[str]:
+    """Strip whitespace, drop blanks and duplicates, keep the caller's order."""
+    seen = []
+    for name in names or []:
+        name = (name or "").strip()
+        if name and name not in seen:
+            seen.append(name)
+    return seen
+
+
+def _attach(db: Session, tag_id: str, name: str) -> Tag:
+    """Get a persistent Tag for a known id without issuing a SELECT."""
+    tag = Tag(id=tag_id, name=name)
+    make_transient_to_detached(tag)
+    return db.merge(tag, load=False)
+
+
+def _lookup(db: Session, names: List[str]) -> Dict[str, str]:
+    if not names:
+        return {}
+    rows = db.query(Tag.id, Tag.name).filter(Tag.name.in_(names)).all()
+    return {name: tag_id for tag_id, name in rows}
+
+
+def resolve_tags(db: Session, names: Iterable[str]) -> List[Tag]:
+    """
+    Return Tag rows for `names` (in order), creating the missing ones.
+    Nothing is committed here; new tags become part of the caller's transaction.
+    """
+    names = normalize_names(names)
+    if not names:
+        return []
+
+    with _lock:
+        ids = {name: _cache[name] for name in names if name in _cache}
+
+    missing = [name for name in names if name not in ids]
+    found = _lookup(db, missing)
+    ids.update(found)
+
+    to_create = [name for name in missing if name not in found]
+    if to_create:
+        # ON CONFLICT keeps the Tag.name unique constraint happy even if
+        # another request created the same tag in the meantime.
+        db.execute(
+            insert(Tag)
+            .values([{"id": str(uuid.uuid4()), "name": name} for name in to_create])
+            .on_conflict_do_nothing(index_elements=[Tag.name])
+        )
+        created = _lookup(db, to_create)
+        ids.update(created)
+        db.info.setdefault(_PENDING_KEY, {}).update(created)
+
+    with _lock:
+        _cache.update(found)
+
+    return [_attach(db, ids[name], name) for name in names]
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        with _lock:
+            _cache.update(pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
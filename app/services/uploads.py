@@ -0,0 +1,125 @@
+# app/services/uploads.py
+"""
+Streaming storage of uploaded files.
+
+An upload is copied chunk by chunk into a temporary file next to its
+destination, hashed (SHA-256) as it goes, and renamed into place with
+``os.replace`` once complete (see ``media_store.put``). Readers never see a
+partial file, and an upload that fails or exceeds its size limit leaves
+nothing behind.
+
+Starlette writes a multipart body to its own temp file before the route
+runs, so the size limit has to be enforced earlier as well:
+``UploadLimitMiddleware`` answers 413 from Content-Length before anything
+is read, and stops reading a body without one once it passes the limit.
+"""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+CHUNK_SIZE = 1024 * 1024
+# Largest accepted upload, configurable per deployment
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "1024")) * 1024 * 1024
+TEMP_PREFIX = ".upload-"
+# Room for the multipart boundaries and ordinary form fields next to the file
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+
+@dataclass
+class StoredFile:
+    path: str
+    size: int
+    sha256: str
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+
+
+def safe_name(filename: str) -> str:
+    """The client's file name without any directory part."""
+    return os.path.basename((filename or "").replace("\\", "/")) or "upload"
+
+
+def spool(source, directory: str, max_bytes: int = None) -> StoredFile:
+    """
+    Copy the binary file object `source` into a temporary file in `directory`.
+    The caller renames it into place (``os.replace``) or ``discard``s it. Blocking.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        discard(temp_path)
+        raise
+
+    return StoredFile(path=temp_path, size=size, sha256=digest.hexdigest())
+
+
+def discard(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def check_size(file: UploadFile, max_bytes: int = None):
+    """Starlette knows the size once the part is spooled; reject before copying."""
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+
+class UploadLimitMiddleware:
+    """Reject multipart request bodies larger than the upload limit before they are spooled."""
+
+    def __init__(self, app, max_bytes: int = None):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        headers = Headers(scope=scope) if scope["type"] == "http" else None
+        if headers is None or not headers.get("content-type", "").startswith("multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.max_bytes or MAX_UPLOAD_BYTES
+        limit = max_bytes + FORM_OVERHEAD_BYTES
+        length = headers.get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse({"detail": _too_large(max_bytes).detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised out of the form parsing, so the route answers 413
+                    raise _too_large(max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base, get_db
+from app.models.drill import Drill
+from app.models.player import Player
+from app.models.player_drill import PlayerDrill
+from app.models.player_history import PlayerHistory
+from app.models.session import Session as BaseballSession
+from app.routers import players
+from app.services import player_summary
+
+# Import models so SQLAlchemy knows about them
+import app.models.tag
+import app.models.concept
+import app.models.concept_relation
+import app.models.concept_version
+import app.models.concept_link
+import app.models.concept_tag
+import app.models.content_version
+import app.models.player_summary
+import app.models.metric_definition
+import app.models.metric_rollup
+import app.models.media_blob
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def client(db_factory):
+    app = FastAPI()
+    app.include_router(players.router)
+
+    def override_get_db():
+        db = db_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+
+def _seed(db_factory, start: int, count: int, drills_per_player: int = 3):
+    """Add `count` players, each with history, drill assignments and a session."""
+    with db_factory() as db:
+        drills = [Drill(id=f"d{start}-{k}", title=f"Drill {k}") for k in range(drills_per_player)]
+        db.add_all(drills)
+        for i in range(start, start + count):
+            player = Player(id=f"p{i:04d}", first_name=f"First{i}", last_name=f"Last{i}", team="A")
+            session = BaseballSession(player_id=player.id, date=datetime(2024, 3, 1), session_type="Bullpen")
+            db.add_all([player, session])
+            db.flush()
+            db.add(PlayerHistory(player_id=player.id, date="2024-01-01", change_type="Signed"))
+            for k, drill in enumerate(drills):
+                db.add(PlayerDrill(player_id=player.id, drill_id=drill.id,
+                                   session_id=session.id if k == 0 else None))
+            player_summary.refresh(db, player.id)
+        db.commit()
+
+
+def _count_queries(engine, call):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = call()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return response, len(statements)
+
+
+def test_list_players_query_count_does_not_grow_with_roster(engine, db_factory, client):
+    _seed(db_factory, 0, 5)
+    small, small_count = _count_queries(engine, lambda: client.get("/players/"))
+    assert small.status_code == 200
+    assert len(small.json()) == 5
+
+    _seed(db_factory, 5, 45)
+    large, large_count = _count_queries(engine, lambda: client.get("/players/"))
+    assert large.status_code == 200
+    assert len(large.json()) == 50
+    assert all(len(p["drills"]) == 3 for p in large.json())
+
+    assert large_count == small_count
+
+
+def test_list_players_page_query_count_does_not_grow_with_page_size(engine, db_factory, client):
+    _seed(db_factory, 0, 60)
+    _, small_count = _count_queries(engine, lambda: client.get("/players/", params={"limit": 5}))
+    page, large_count = _count_queries(engine, lambda: client.get("/players/", params={"limit": 50}))
+    assert len(page.json()) == 50
+    assert page.headers["X-Next-Cursor"]
+
+    assert large_count == small_count